@@ -0,0 +1,132 @@
+# Teoria da Informacao, LEI, 2022
+# Batch decompression: many gzip files over a pool of worker processes
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from gzip import GZIP, outputName
+from inflate import BACKENDS
+
+# mkstemp creates files readable by the owner only: outputs get the mode open() would give them
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def decompressFile(task):
+    ''' worker: decompresses one file. task = (path, output directory, use the name stored in the
+        header, overwrite, backend). Returns (path, output path, compressed size, decompressed size,
+        seconds, error message or None); errors are reported, never raised '''
+    path, outDir, headerName, force, backend = task
+    t = time.perf_counter()
+    outPath = os.path.join(outDir or '.', outputName(path))
+    inSize = outSize = 0
+    tmpName = None
+    try:
+        if not headerName and not force and os.path.exists(outPath):
+            raise FileExistsError('%s already exists' % outPath)
+
+        gz = GZIP(path, verbose=False, backend=backend)
+        try:
+            inSize = gz.fileSize
+            # decoded to a temporary file, renamed when complete: a failure leaves no partial output
+            fd, tmpName = tempfile.mkstemp(prefix='.', suffix='.part', dir=outDir or '.')
+            with os.fdopen(fd, 'wb') as f:
+                outSize = gz.decompressTo(f)
+        finally:
+            gz.close()
+
+        if headerName and gz.members[0].header.fName:
+            outPath = os.path.join(outDir or '.', os.path.basename(gz.members[0].header.fName))
+        os.chmod(tmpName, 0o666 & ~UMASK)
+        if force:
+            os.replace(tmpName, outPath)
+            tmpName = None
+        else:
+            # a link fails if outPath exists, even when another worker has just written it (the check
+            # above is only a shortcut): no output is ever overwritten. The temporary name is unlinked below
+            try:
+                os.link(tmpName, outPath)
+            except FileExistsError:
+                raise FileExistsError('%s already exists' % outPath)
+        return path, outPath, inSize, outSize, time.perf_counter() - t, None
+
+    except Exception as e:  # reported for this file: the other files of the batch go on
+        return path, None, inSize, outSize, time.perf_counter() - t, str(e) or type(e).__name__
+    finally:
+        if tmpName is not None:
+            os.unlink(tmpName)
+
+
+def inputFiles(patterns, lists):
+    ''' file names from the command line (glob patterns, '-' for names on stdin) and list files '''
+    names = []
+    for pattern in patterns:
+        if pattern == '-':
+            names += [line.strip() for line in sys.stdin if line.strip()]
+        else:
+            # a pattern that matches nothing is kept: reported as a missing file
+            names += sorted(glob.glob(pattern, recursive=True)) or [pattern]
+    for listFile in lists:
+        with open(listFile) as f:
+            names += [line.strip() for line in f if line.strip()]
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Decompresses many gzip files with a pool of worker processes')
+    parser.add_argument('files', nargs='*', help="gzip files or glob patterns ('-': names read from stdin)")
+    parser.add_argument('-l', '--list', action='append', default=[], help='file with one gzip file name per line')
+    parser.add_argument('-o', '--output', help='output directory (default: current directory)')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('-N', '--name', action='store_true', help='use the file name stored in the gzip header')
+    parser.add_argument('-f', '--force', action='store_true', help='overwrite existing output files')
+    parser.add_argument('-q', '--quiet', action='store_true', help='report failures and the summary only')
+    parser.add_argument('--backend', choices=list(BACKENDS), help='inflate backend (default: fastest available)')
+    args = parser.parse_args(argv)
+
+    names = inputFiles(args.files, args.list)
+    if not names:
+        parser.error('no input files')
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    tasks = [(name, args.output, args.name, args.force, args.backend) for name in names]
+    t = time.perf_counter()
+    failed = inTotal = outTotal = 0
+
+    if args.workers > 1 and len(tasks) > 1:
+        pool = ProcessPoolExecutor(min(args.workers, len(tasks)))
+        results = pool.map(decompressFile, tasks, chunksize=max(1, min(64, len(tasks) // (4 * args.workers))))
+    else:
+        pool = None
+        results = map(decompressFile, tasks)
+
+    try:
+        for path, outPath, inSize, outSize, seconds, error in results:
+            if error is not None:
+                failed += 1
+                print("%s: error: %s" % (path, error), file=sys.stderr)
+                continue
+            inTotal += inSize
+            outTotal += outSize
+            if not args.quiet:
+                print("%s -> %s: %d -> %d bytes, %.2f MB/s"
+                      % (path, outPath, inSize, outSize, outSize / 1e6 / max(seconds, 1e-9)))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - t
+    print("%d file(s): %d ok, %d failed; %d -> %d bytes in %.2f s (%.2f MB/s)"
+          % (len(tasks), len(tasks) - failed, failed, inTotal, outTotal, elapsed, outTotal / 1e6 / max(elapsed, 1e-9)),
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,349 @@
+# Teoria da Informacao, LEI, 2022
+# Inflate benchmark: throughput, per-block and per-phase timing, peak RSS and peak memory
+# of in-memory decoding, written as JSON
+
+import argparse
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # not available on Windows: peak RSS is not reported
+    resource = None
+
+from gzip import FIXED_LITLEN_LENS, GZIP, decompressParallel
+from huffmantree import ArrayHuffmanTree, HuffmanTree, canonicalCodes
+from inflate import BACKENDS, getBackend
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLES = sorted(glob.glob(os.path.join(HERE, '..', 'Test Samples', '*.gz')))
+SYNTHETIC = ['random', 'repetitive', 'longdistance', 'smallblocks', 'stored']
+PHASES = ['header', 'tables', 'lz77', 'stored']
+
+
+def synthetic(kind, size, seed=2022):
+    ''' returns the gzip data of a synthetic corpus of about size bytes (compressed with zlib) '''
+    rnd = random.Random(seed)
+    level = 6
+    flushEvery = 0
+
+    if kind == 'random':  # random letters: literals only, almost no matches
+        data = bytes(rnd.choices(b'abcdefghijklmnopqrstuvwxyz ', k=size))
+    elif kind == 'repetitive':  # long runs and short periods: long overlapping matches
+        data = ((b'a' * 1000 + b'abc' * 300 + b'0123456789' * 50 + b'\n') * (size // 2411 + 1))[:size]
+    elif kind == 'longdistance':  # a 24 KiB random block repeated with a few edits: matches 24 KiB back
+        block = bytearray(rnd.randbytes(24576))
+        parts = []
+        for i in range(size // len(block) + 1):
+            for k in range(8):
+                block[rnd.randrange(len(block))] = rnd.randrange(256)
+            parts.append(bytes(block))
+        data = b''.join(parts)[:size]
+    elif kind == 'smallblocks':  # text flushed every 512 bytes: thousands of small dynamic blocks
+        with open(os.path.join(HERE, 'FAQ.txt'), 'rb') as f:
+            text = f.read()
+        data = (text * (size // len(text) + 1))[:size]
+        flushEvery = 512
+    elif kind == 'stored':  # incompressible data at level 0: stored blocks only
+        data = rnd.randbytes(size)
+        level = 0
+    else:
+        raise ValueError('Unknown corpus: %s' % kind)
+
+    comp = zlib.compressobj(level, zlib.DEFLATED, 31)
+    if flushEvery:
+        parts = [comp.compress(data[i:i + flushEvery]) + comp.flush(zlib.Z_FULL_FLUSH)
+                 for i in range(0, len(data), flushEvery)]
+    else:
+        parts = [comp.compress(data)]
+    return b''.join(parts) + comp.flush()
+
+
+def peakRSS():
+    ''' peak resident set size of this process in KiB (None if unknown) '''
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss  # bytes on macOS, KiB elsewhere
+
+
+def tracedPeak(function):
+    ''' runs function under tracemalloc and returns the peak of the memory it allocated, in KiB '''
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] >> 10
+    finally:
+        tracemalloc.stop()
+
+
+def _timed(phase, method):
+    ''' wraps a GZIP method, adding the time spent in it to self.phases[phase] '''
+    def timed(self, *args):
+        t = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            self.phases[phase] += time.perf_counter() - t
+    return timed
+
+
+class TimedGZIP(GZIP):
+    ''' pure-Python decoder that measures each phase: header parsing, table construction
+        (code lengths, treeCodeLens and huffmanFromLens), LZ77 decoding and stored blocks,
+        and the time of every block '''
+
+    getHeader = _timed('header', GZIP.getHeader)
+    readDynamicTrees = _timed('tables', GZIP.readDynamicTrees)
+    decompress_LZ77 = _timed('lz77', GZIP.decompress_LZ77)
+    copyStored = _timed('stored', GZIP.copyStored)
+
+    def __init__(self, source):
+        GZIP.__init__(self, source, verbose=False, backend='python')
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.blockTimes = []
+
+    def inflateBlocks(self, out):
+        t = time.perf_counter()
+        for _ in GZIP.inflateBlocks(self, out):
+            self.blockTimes.append(time.perf_counter() - t)
+            yield
+            t = time.perf_counter()
+
+
+def bestRun(gzData, backend, repeat, cold):
+    ''' decodes gzData repeat times and returns the best time and the decompressed size.
+        cold: the table cache of GZIP is emptied before each run, so tables are built again '''
+    best = None
+    for i in range(repeat):
+        if cold:
+            GZIP.tableCache.clear()
+        t = time.perf_counter()
+        outSize = sum(len(chunk) for chunk in GZIP(gzData, verbose=False, backend=backend).decompressChunks())
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best, outSize
+
+
+def runCase(name, source, size, repeat, backends):
+    ''' decodes one corpus (file name, or synthetic kind when source is None) and returns its results.
+        Runs in a worker process of its own, so that peak RSS belongs to this corpus '''
+    if source is None:
+        gzData = synthetic(name, size)
+    else:
+        with open(source, 'rb') as f:
+            gzData = f.read()
+    result = {'name': name, 'compressed': len(gzData), 'baseRSS': peakRSS()}
+
+    # throughput of each backend: best of repeat runs, each one with an empty table cache (cold, as in
+    # a new process); the pure-Python decoder is also timed reusing the tables of the runs before (warm)
+    speeds = {}
+    for backend in backends:
+        best, outSize = bestRun(gzData, backend, repeat, cold=True)
+        speeds[backend] = {'seconds': round(best, 6), 'MBps': round(outSize / 1e6 / max(best, 1e-9), 3)}
+        if backend == 'python':
+            warm, outSize = bestRun(gzData, backend, repeat, cold=False)
+            speeds[backend]['warm'] = {'seconds': round(warm, 6), 'MBps': round(outSize / 1e6 / max(warm, 1e-9), 3)}
+    result['size'] = outSize
+    result['backends'] = speeds
+
+    # peak memory of decoding to memory (fastest backend): chunks joined, buffer preallocated from ISIZE
+    backend = backends[0]
+    result['memory'] = {
+        'backend': backend,
+        'join': tracedPeak(lambda: b''.join(GZIP(gzData, verbose=False, backend=backend).decompressChunks())),
+        'into': tracedPeak(lambda: GZIP(gzData, verbose=False, backend=backend).decompressInto())}
+
+    # phases and blocks: one instrumented run of the pure-Python decoder, building every table
+    GZIP.tableCache.clear()
+    gz = TimedGZIP(gzData)
+    for chunk in gz.decompressChunks():
+        pass
+    times = sorted(gz.blockTimes)
+    result['phases'] = {phase: round(seconds, 6) for phase, seconds in gz.phases.items()}
+    result['blocks'] = len(times)
+    if times:
+        result['blockSeconds'] = {'min': round(times[0], 6), 'median': round(times[len(times) // 2], 6),
+                                  'max': round(times[-1], 6), 'mean': round(sum(times) / len(times), 6)}
+    result['peakRSS'] = peakRSS()
+    return result
+
+
+def runParallel(name, source, size, repeat, workerCounts, span):
+    ''' decompressParallel with each number of workers against serial decoding (best of repeat runs),
+        from an index with a checkpoint every span bytes. Every range but the first resumes with
+        a window of history, which only the pure-Python decoder can do: speedups are measured
+        against the serial pure-Python decoder ('serial'). The serial time of the default backend
+        is reported too ('serialDefault'): with a compiled backend, decompressParallel cannot beat it.
+        Synthetic corpora are written to a temporary file first: the workers open the file themselves '''
+    tmpName = None
+    if source is None:
+        fd, tmpName = tempfile.mkstemp(suffix='.gz')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(synthetic(name, size))
+        source = tmpName
+    try:
+        gz = GZIP(source)
+        try:
+            index = gz.buildIndex(span)
+        finally:
+            gz.close()
+
+        def serial(backend):
+            gz = GZIP(source, backend=backend)
+            try:
+                for chunk in gz.decompressChunks():
+                    pass
+            finally:
+                gz.close()
+
+        def parallel(workers):
+            for chunk in decompressParallel(source, index, workers):
+                pass
+
+        best = bestTime(lambda: serial('python'), repeat)
+        default = bestTime(lambda: serial(None), repeat)
+        result = {'span': span, 'checkpoints': len(index.checkpoints), 'serial': round(best, 6),
+                  'serialDefault': round(default, 6), 'defaultBackend': getBackend().name, 'workers': {}}
+        for workers in workerCounts:
+            elapsed = bestTime(lambda: parallel(workers), repeat)
+            result['workers'][str(workers)] = {'seconds': round(elapsed, 6), 'speedup': round(best / max(elapsed, 1e-9), 3),
+                                               'speedupDefault': round(default / max(elapsed, 1e-9), 3)}
+        return result
+    finally:
+        if tmpName is not None:
+            os.unlink(tmpName)
+
+
+def bestTime(function, repeat):
+    ''' best time of repeat calls of function, in seconds '''
+    best = None
+    for i in range(repeat):
+        t = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compareTrees(repeat, count=100):
+    ''' node tree (HuffmanTree) against flat arrays (ArrayHuffmanTree) for the fixed literal/length code:
+        best time to build count trees and to look up every code in them, and the memory they take (KiB) '''
+    lens = FIXED_LITLEN_LENS
+    codes = [(code, length, n) for n, (code, length) in enumerate(zip(canonicalCodes(lens), lens))]
+
+    def build(Tree):
+        trees = []
+        for i in range(count):
+            tree = Tree()
+            for code, length, n in codes:
+                tree.addCode(code, length, n)
+            trees.append(tree)
+        return trees
+
+    results = {}
+    for Tree in (HuffmanTree, ArrayHuffmanTree):
+        buildBest = lookupBest = None
+        for i in range(repeat):
+            t = time.perf_counter()
+            trees = build(Tree)
+            elapsed = time.perf_counter() - t
+            buildBest = elapsed if buildBest is None else min(buildBest, elapsed)
+
+            t = time.perf_counter()
+            for tree in trees:
+                for code, length, n in codes:
+                    tree.findCode(code, length)
+            elapsed = time.perf_counter() - t
+            lookupBest = elapsed if lookupBest is None else min(lookupBest, elapsed)
+        results[Tree.__name__] = {'trees': count, 'build': round(buildBest, 6), 'lookup': round(lookupBest, 6),
+                                  'memory': tracedPeak(lambda: build(Tree))}
+    return results
+
+
+def gitCommit():
+    ''' short hash of the commit being measured (None outside a git checkout) '''
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, fileName):
+    ''' prints the speed of each corpus and backend relative to an earlier report '''
+    with open(fileName) as f:
+        old = {r['name']: r for r in json.load(f)['results']}
+    for r in report['results']:
+        if r['name'] not in old:
+            continue
+        for backend, speed in r['backends'].items():
+            before = old[r['name']]['backends'].get(backend)
+            if before:
+                print("%-28s %-7s %8.3f -> %8.3f MB/s (x%.2f)"
+                      % (r['name'], backend, before['MBps'], speed['MBps'], speed['MBps'] / max(before['MBps'], 1e-9)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inflate benchmark (results written as JSON)')
+    parser.add_argument('files', nargs='*', help='gzip files (default: Test Samples and the synthetic corpora)')
+    parser.add_argument('-o', '--output', default='benchmark.json', help='JSON results file')
+    parser.add_argument('-n', '--repeat', type=int, default=3, help='runs per backend (best is kept)')
+    parser.add_argument('--size', type=int, default=1 << 21, help='bytes of each synthetic corpus')
+    parser.add_argument('--backend', action='append', choices=list(BACKENDS), help='backend to time (default: all)')
+    parser.add_argument('--compare', metavar='JSON', help='earlier results to compare with')
+    parser.add_argument('--parallel', metavar='N,N,...', help='also time decompressParallel with these worker counts')
+    parser.add_argument('--span', type=int, default=1 << 18, help='bytes between index checkpoints (--parallel)')
+    parser.add_argument('--trees', action='store_true', help='also compare HuffmanTree with ArrayHuffmanTree')
+    args = parser.parse_args(argv)
+
+    if args.files:
+        cases = [(os.path.basename(f), f) for f in args.files]
+    else:
+        cases = [(os.path.basename(f), f) for f in SAMPLES] + [(kind, None) for kind in SYNTHETIC]
+    backends = args.backend or list(BACKENDS)
+    workerCounts = [int(n) for n in args.parallel.split(',')] if args.parallel else []
+
+    report = {'commit': gitCommit(), 'python': sys.version.split()[0], 'platform': sys.platform,
+              'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'repeat': args.repeat, 'results': []}
+    for name, source in cases:
+        with ProcessPoolExecutor(1) as pool:
+            r = pool.submit(runCase, name, source, args.size, args.repeat, backends).result()
+        report['results'].append(r)
+        print("%-28s %9d bytes, %5d block(s), %s, peak RSS %s KiB, in memory %d KiB (joined: %d KiB)"
+              % (name, r['size'], r['blocks'],
+                 ', '.join('%s %.2f MB/s' % (b, s['MBps']) + (' (warm %.2f)' % s['warm']['MBps'] if 'warm' in s else '')
+                           for b, s in r['backends'].items()), r['peakRSS'],
+                 r['memory']['into'], r['memory']['join']))
+        if workerCounts:
+            r['parallel'] = p = runParallel(name, source, args.size, args.repeat, workerCounts, args.span)
+            print("%-28s %d checkpoint(s), serial python %.3f s (%s %.3f s), %s"
+                  % ('', p['checkpoints'], p['serial'], p['defaultBackend'], p['serialDefault'],
+                     ', '.join('%s worker(s) %.3f s (x%.2f)' % (n, w['seconds'], w['speedup'])
+                               for n, w in p['workers'].items())))
+
+    if args.trees:
+        report['trees'] = compareTrees(args.repeat)
+        for name, r in report['trees'].items():
+            print("%-28s %d trees: built in %.4f s, every code found in %.4f s, %d KiB"
+                  % (name, r['trees'], r['build'], r['lookup'], r['memory']))
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("Results written to %s" % args.output)
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
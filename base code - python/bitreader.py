@@ -0,0 +1,184 @@
+# Teoria da Informacao, LEI, 2022
+# Buffered bit reader for DEFLATE streams
+
+from errors import TruncatedError
+
+# MASKS[n] == (2 ** n) - 1, precomputed for every possible request
+MASKS = [(1 << n) - 1 for n in range(65)]
+
+
+class BitReader:
+    ''' reads bits (LSB first, as in DEFLATE) and bytes from a buffer or a binary file.
+        Bits are kept in a 64-bit accumulator (bits_buffer) that is refilled up to
+        8 bytes at a time; files are read in large chunks, never byte by byte. '''
+
+    CHUNK = 1 << 16  # bytes read from the file on each refill
+    KEEP = 8  # bytes kept before pos when the buffer is refilled (enough to un-read the accumulator)
+
+    def __init__(self, source):
+        if hasattr(source, 'read'):  # binary file object: read it in chunks
+            self.f = source
+            self.buf = b''
+        else:  # bytes-like object with the whole stream (a memoryview, e.g. of a memory map, is not copied)
+            self.f = None
+            self.buf = source.cast('B') if isinstance(source, memoryview) else bytes(source)
+
+        self.offset = 0  # stream position of buf[0]
+        self.pos = 0  # next byte of buf to load into the accumulator
+        self.bits_buffer = 0
+        self.available_bits = 0
+
+    def _load(self, size=0):
+        ''' appends the next chunk of the file to the buffer. Returns False at end of file '''
+        if self.f is None:
+            return False
+
+        data = self.f.read(max(self.CHUNK, size))
+        if not data:
+            self.f = None
+            return False
+
+        base = max(0, self.pos - self.KEEP)
+        self.buf = self.buf[base:] + data
+        self.offset += base
+        self.pos -= base
+        return True
+
+    def _refill(self):
+        ''' loads as many whole bytes as fit in the 64-bit accumulator '''
+        while self.pos + 8 > len(self.buf) and self._load():
+            pass
+
+        pos = self.pos
+        chunk = self.buf[pos:pos + ((64 - self.available_bits) >> 3)]
+        self.bits_buffer |= int.from_bytes(chunk, 'little') << self.available_bits
+        self.available_bits += len(chunk) << 3
+        self.pos = pos + len(chunk)
+
+    def feed(self, data):
+        ''' appends data to the buffer (push mode: the stream is given in pieces, as it arrives) '''
+        base = max(0, self.pos - self.KEEP)
+        self.buf = self.buf[base:] + bytes(data)
+        self.offset += base
+        self.pos -= base
+
+    def mark(self):
+        ''' returns the current position, to go back to it with reset '''
+        return self.offset + self.pos, self.bits_buffer, self.available_bits
+
+    def reset(self, mark):
+        ''' goes back to a position returned by mark (its bytes must still be in the buffer) '''
+        position, self.bits_buffer, self.available_bits = mark
+        self.pos = position - self.offset
+
+    def peek(self, n):
+        ''' returns the next n bits without consuming them (zero padded past the end of the stream) '''
+        if self.available_bits < n:
+            self._refill()
+        return self.bits_buffer & MASKS[n]
+
+    def consume(self, n):
+        ''' drops n bits previously returned by peek '''
+        if self.available_bits < n:
+            self._refill()
+            if self.available_bits < n:
+                raise TruncatedError()
+        self.bits_buffer >>= n
+        self.available_bits -= n
+
+    def readBits(self, n, keep=False):
+        ''' returns the next n bits (n <= 57); if keep is True they are not consumed '''
+        if self.available_bits < n:
+            self._refill()
+            if self.available_bits < n and not keep:
+                raise TruncatedError()
+
+        value = self.bits_buffer & MASKS[n]
+        if not keep:
+            self.bits_buffer >>= n
+            self.available_bits -= n
+        return value
+
+    def alignToByte(self):
+        ''' skips the remaining bits of the current byte and gives the whole bytes
+            still in the accumulator back to the buffer '''
+        self.pos -= self.available_bits >> 3
+        self.bits_buffer = 0
+        self.available_bits = 0
+
+    def _fill(self, n):
+        ''' aligns to a byte boundary and loads the file until n bytes follow pos (or it ends) '''
+        self.alignToByte()
+        missing = self.pos + n - len(self.buf)
+        while missing > 0 and self._load(missing):
+            missing = self.pos + n - len(self.buf)
+
+    def peekBytes(self, n):
+        ''' aligns to a byte boundary and returns a copy of the next n bytes (fewer at the end
+            of the stream) without consuming them '''
+        self._fill(n)
+        return bytes(self.buf[self.pos:self.pos + n])
+
+    def readBytes(self, n):
+        ''' aligns to a byte boundary and returns the next n bytes '''
+        self._fill(n)
+        data = self.buf[self.pos:self.pos + n]
+        if len(data) < n:
+            raise TruncatedError()
+        self.pos += n
+        return data
+
+    def skipBytes(self, n):
+        ''' aligns to a byte boundary and skips the next n bytes without copying them:
+            past the buffer, a seekable file is seeked instead of read '''
+        self.alignToByte()
+        left = len(self.buf) - self.pos
+        if n > left and self.f is not None and self.f.seekable():
+            position = self.f.tell()
+            if position + n - left > self.f.seek(0, 2):
+                raise TruncatedError()
+            self.f.seek(position + n - left)
+            self.offset += self.pos + n
+            self.buf = b''
+            self.pos = 0
+            return
+
+        while n > left:
+            n -= left
+            self.pos = len(self.buf)
+            if not self._load():
+                raise TruncatedError()
+            left = len(self.buf) - self.pos
+        self.pos += n
+
+    def readChunk(self):
+        ''' aligns to a byte boundary and returns every byte buffered after the current position
+            (reading the next chunk of the file if there is none); b'' at end of file.
+            Bytes that were not used can be given back with unread '''
+        self.alignToByte()
+        if self.pos >= len(self.buf) and not self._load():
+            return b''
+        data = self.buf[self.pos:]
+        self.pos = len(self.buf)
+        return data
+
+    def unread(self, n):
+        ''' gives back the last n bytes returned by readChunk or readBytes '''
+        self.pos -= n
+
+    def readByte(self):
+        ''' aligns to a byte boundary and returns the next byte '''
+        return self.readBytes(1)[0]
+
+    def eof(self):
+        ''' True if every bit of the stream was consumed (ignoring the padding bits of the last byte) '''
+        if self.available_bits >= 8:
+            return False
+        while self.pos >= len(self.buf):
+            if not self._load():
+                return True
+        return False
+
+    def tell(self):
+        ''' position of the next unread bit, in bits from the start of the stream '''
+        return ((self.offset + self.pos) << 3) - self.available_bits
@@ -0,0 +1,75 @@
+# Teoria da Informacao, LEI, 2022
+# CRC-32 (ISO 3309 / ITU-T V.42, as used by the GZIP trailer, RFC 1952 8.)
+# and Adler-32 (zlib trailer, RFC 1950 8.)
+
+import struct
+from itertools import accumulate
+
+try:  # C implementation from the standard library, when the interpreter provides it
+    from binascii import crc32 as _crc32_c
+except ImportError:
+    _crc32_c = None
+
+try:
+    from zlib import adler32 as _adler32_c
+except ImportError:
+    _adler32_c = None
+
+
+def _makeTables():
+    ''' CRC_TABLES[k][n]: CRC of byte n followed by k zero bytes (tables for slicing-by-8) '''
+    t0 = [0] * 256
+    for n in range(256):
+        c = n
+        for k in range(8):
+            c = (c >> 1) ^ 0xEDB88320 if c & 1 else c >> 1
+        t0[n] = c
+
+    tables = [t0]
+    for k in range(1, 8):
+        prev = tables[-1]
+        tables.append([t0[c & 0xFF] ^ (c >> 8) for c in prev])
+    return tables
+
+CRC_TABLES = _makeTables()
+
+
+def crc32Slice8(data, crc=0):
+    ''' updates crc with data, 8 bytes per step (slicing-by-8) '''
+    t0, t1, t2, t3, t4, t5, t6, t7 = CRC_TABLES
+    data = memoryview(data).cast('B')
+    n8 = len(data) & ~7
+
+    crc ^= 0xFFFFFFFF
+    for lo, hi in struct.iter_unpack('<II', data[:n8]):
+        lo ^= crc
+        crc = (t7[lo & 0xFF] ^ t6[(lo >> 8) & 0xFF] ^ t5[(lo >> 16) & 0xFF] ^ t4[lo >> 24] ^
+               t3[hi & 0xFF] ^ t2[(hi >> 8) & 0xFF] ^ t1[(hi >> 16) & 0xFF] ^ t0[hi >> 24])
+    for b in data[n8:]:
+        crc = t0[(crc ^ b) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+
+# crc32(data, crc=0): incremental CRC-32, C version if available, slicing-by-8 otherwise
+crc32 = _crc32_c if _crc32_c is not None else crc32Slice8
+
+
+ADLER_BASE = 65521  # largest prime below 2^16
+ADLER_NMAX = 5552  # most bytes summed before the sums must be reduced modulo ADLER_BASE (as in zlib)
+
+
+def adler32Sums(data, adler=1):
+    ''' updates adler with data, NMAX bytes per step: s1 grows by the sum of the bytes and
+        s2 by n * s1 plus the sum of the running sums of the bytes '''
+    data = memoryview(data).cast('B')
+    s1 = adler & 0xFFFF
+    s2 = adler >> 16
+    for i in range(0, len(data), ADLER_NMAX):
+        chunk = data[i:i + ADLER_NMAX]
+        s2 = (s2 + len(chunk) * s1 + sum(accumulate(chunk))) % ADLER_BASE
+        s1 = (s1 + sum(chunk)) % ADLER_BASE
+    return (s2 << 16) | s1
+
+
+# adler32(data, adler=1): incremental Adler-32, C version if available, pure Python otherwise
+adler32 = _adler32_c if _adler32_c is not None else adler32Sums
@@ -0,0 +1,444 @@
+# Teoria da Informacao, LEI, 2022
+# DEFLATE compressor (RFC 1951) with GZIP container (RFC 1952):
+# LZ77 with hash chains over a 32 KiB window, length-limited Huffman codes (package-merge)
+
+import heapq
+import os
+import sys
+import time
+
+from checksum import crc32
+from huffmantree import canonicalCodes, reverseBits
+from gzip import (GZIPHeader, LENGTH_BASE, LENGTH_EXTRA, DIST_BASE, DIST_EXTRA, CLEN_ORDER,
+                  FIXED_LITLEN_LENS, FIXED_DIST_LENS)
+
+WSIZE = 32768
+WMASK = WSIZE - 1
+MIN_MATCH = 3
+MAX_MATCH = 258
+BLOCK_SYMBOLS = 1 << 14  # symbols per block before the block is closed
+MAX_STORED = 65535  # longest stored block
+
+# compression levels (as zlib's configuration_table): good_length, max_lazy, nice_length, max_chain.
+# levels 1-3 take the first good match (greedy), levels 4-9 use lazy matching
+LEVELS = {
+    1: (4, 4, 8, 4),
+    2: (4, 5, 16, 8),
+    3: (4, 6, 32, 32),
+    4: (4, 4, 16, 16),
+    5: (8, 16, 32, 32),
+    6: (8, 16, 128, 128),
+    7: (8, 32, 128, 256),
+    8: (32, 128, 258, 1024),
+    9: (32, 258, 258, 4096),
+}
+
+
+def _lengthSymbols():
+    ''' LENGTH_SYMBOL[length]: index of the length code (0..28) for lengths 3..258 '''
+    table = [0] * (MAX_MATCH + 1)
+    for code in range(len(LENGTH_BASE) - 1):
+        for length in range(LENGTH_BASE[code], LENGTH_BASE[code + 1]):
+            table[length] = code
+    table[MAX_MATCH] = len(LENGTH_BASE) - 1
+    return table
+
+def _distSymbols():
+    ''' DIST_SYMBOL[distance - 1]: distance code (0..29) for distances 1..32768 '''
+    table = []
+    for code in range(len(DIST_BASE)):
+        table += [code] * (1 << DIST_EXTRA[code])
+    return table
+
+LENGTH_SYMBOL = _lengthSymbols()
+DIST_SYMBOL = _distSymbols()
+
+
+class BitWriter:
+    ''' writes bits LSB first, as DEFLATE expects, into a bytearray '''
+
+    def __init__(self):
+        self.out = bytearray()
+        self.bits_buffer = 0
+        self.available_bits = 0
+
+    def writeBits(self, value, n):
+        self.bits_buffer |= value << self.available_bits
+        self.available_bits += n
+        if self.available_bits >= 64:
+            self.out += (self.bits_buffer & 0xFFFFFFFFFFFFFFFF).to_bytes(8, 'little')
+            self.bits_buffer >>= 64
+            self.available_bits -= 64
+
+    def alignToByte(self):
+        ''' pads the current byte with zeros and writes the pending bytes '''
+        nbytes = (self.available_bits + 7) >> 3
+        self.out += self.bits_buffer.to_bytes(nbytes, 'little')
+        self.bits_buffer = 0
+        self.available_bits = 0
+
+    def writeBytes(self, data):
+        self.alignToByte()
+        self.out += data
+
+    def getvalue(self):
+        self.alignToByte()
+        return bytes(self.out)
+
+
+def codeLengths(freqs, limit):
+    ''' optimal code lengths no longer than limit for the symbol frequencies (package-merge).
+        Symbols with frequency 0 get length 0; a single used symbol gets length 1 '''
+
+    lengths = [0] * len(freqs)
+    leaves = sorted((f, (s,)) for s, f in enumerate(freqs) if f)
+    if len(leaves) == 1:
+        lengths[leaves[0][1][0]] = 1
+    if len(leaves) <= 1:
+        return lengths
+
+    # each round packages pairs of the previous list and merges them with the leaves;
+    # after limit - 1 rounds the first 2n - 2 items say how deep each symbol goes
+    items = leaves
+    for _ in range(limit - 1):
+        packages = [(items[i][0] + items[i + 1][0], items[i][1] + items[i + 1][1])
+                    for i in range(0, len(items) - 1, 2)]
+        items = list(heapq.merge(leaves, packages, key=lambda item: item[0]))
+
+    for weight, symbols in items[:2 * len(leaves) - 2]:
+        for s in symbols:
+            lengths[s] += 1
+    return lengths
+
+
+def writerCodes(lengths):
+    ''' canonical Huffman codes of the code lengths, bit-reversed so that they can be
+        written LSB first with BitWriter.writeBits '''
+    codes = canonicalCodes(lengths)
+    return [reverseBits(c, l) for c, l in zip(codes, lengths)]
+
+
+def runLengths(lens):
+    ''' encodes code lengths with the code length alphabet: list of (symbol, extra bits value) '''
+
+    out = []
+    i = 0
+    n = len(lens)
+    while i < n:
+        length = lens[i]
+        run = 1
+        while i + run < n and lens[i + run] == length:
+            run += 1
+
+        if length == 0 and run >= 3:
+            while run >= 11:
+                r = min(run, 138)
+                out.append((18, r - 11))
+                run -= r
+                i += r
+            if run >= 3:
+                out.append((17, run - 3))
+                i += run
+                run = 0
+        elif length != 0 and run >= 4:
+            out.append((length, 0))
+            run -= 1
+            i += 1
+            while run >= 3:
+                r = min(run, 6)
+                out.append((16, r - 3))
+                run -= r
+                i += r
+
+        for _ in range(run):
+            out.append((length, 0))
+            i += 1
+    return out
+
+
+class Deflater:
+    ''' DEFLATE compressor. compress(data) returns the raw deflate stream '''
+
+    def __init__(self, level=6):
+        if not 0 <= level <= 9:
+            raise ValueError('Error: compression level must be between 0 and 9')
+        self.level = level
+
+    # --- LZ77
+
+    def _tokens(self, data):
+        ''' generator: LZ77 parse of data in blocks. Yields (tokens, start, end) where tokens
+            are literals (< 256) or matches (length << 15 | distance - 1) covering data[start:end] '''
+
+        good, maxLazy, nice, maxChain = LEVELS[self.level]
+        lazy = self.level >= 4
+        n = len(data)
+        head = {}
+        prev = [-1] * WSIZE
+
+        def insert(p):
+            ''' adds position p to its hash chain '''
+            if p + MIN_MATCH <= n:
+                key = (data[p] << 16) | (data[p + 1] << 8) | data[p + 2]
+                prev[p & WMASK] = head.get(key, -1)
+                head[key] = p
+
+        def find(p, prevLength):
+            ''' adds p to its hash chain and returns the longest match (length, distance) starting at p '''
+            if p + MIN_MATCH > n:
+                return 0, 0
+            key = (data[p] << 16) | (data[p + 1] << 8) | data[p + 2]
+            cand = head.get(key, -1)
+            prev[p & WMASK] = cand
+            head[key] = p
+
+            bestLen, bestDist = 0, 0
+            maxLen = min(MAX_MATCH, n - p)
+            limit = p - WSIZE
+            chain = maxChain >> 2 if prevLength >= good else maxChain
+            while cand > limit and cand >= 0 and chain > 0:
+                # quick rejection: the match must improve on bestLen
+                if data[cand + bestLen] == data[p + bestLen]:
+                    length = 0
+                    while length + 16 <= maxLen and data[cand + length:cand + length + 16] == data[p + length:p + length + 16]:
+                        length += 16
+                    while length < maxLen and data[cand + length] == data[p + length]:
+                        length += 1
+                    if length > bestLen:
+                        bestLen, bestDist = length, p - cand
+                        if length >= nice or length == maxLen:
+                            break
+                cand = prev[cand & WMASK]
+                chain -= 1
+
+            if bestLen < MIN_MATCH:
+                return 0, 0
+            return bestLen, bestDist
+
+        tokens = []
+        start = 0
+        i = 0
+        length, dist = find(0, 0)
+        while i < n:
+            if length:
+                if lazy and length < maxLazy and i + 1 < n:
+                    # lazy matching: a longer match at the next position wins
+                    nextLength, nextDist = find(i + 1, length)
+                    if nextLength > length:
+                        tokens.append(data[i])
+                        i += 1
+                        length, dist = nextLength, nextDist
+                        continue
+                    first = i + 2
+                else:
+                    first = i + 1
+
+                tokens.append((length << 15) | (dist - 1))
+                for p in range(first, i + length):
+                    insert(p)
+                i += length
+            else:
+                tokens.append(data[i])
+                i += 1
+
+            if len(tokens) >= BLOCK_SYMBOLS:
+                yield tokens, start, i
+                tokens = []
+                start = i
+
+            length, dist = find(i, 0) if i < n else (0, 0)
+
+        yield tokens, start, n
+
+    # --- blocks
+
+    def _frequencies(self, tokens):
+        litFreq = [0] * 286
+        distFreq = [0] * 30
+        for t in tokens:
+            if t < 256:
+                litFreq[t] += 1
+            else:
+                litFreq[257 + LENGTH_SYMBOL[t >> 15]] += 1
+                distFreq[DIST_SYMBOL[t & 0x7FFF]] += 1
+        litFreq[256] = 1
+        return litFreq, distFreq
+
+    def _dataBits(self, litFreq, distFreq, litLens, distLens):
+        ''' bits needed to write the symbols of the block (with extra bits) using these code lengths '''
+        bits = sum(f * l for f, l in zip(litFreq, litLens))
+        bits += sum(f * (l + e) for f, l, e in zip(distFreq, distLens, DIST_EXTRA))
+        bits += sum(f * e for f, e in zip(litFreq[257:], LENGTH_EXTRA))
+        return bits
+
+    def _dynamicHeader(self, litLens, distLens):
+        ''' HLIT, HDIST, HCLEN, code length code lengths and the run-length encoded code lengths '''
+        hlit = max(257, max(s for s, l in enumerate(litLens) if l) + 1)
+        hdist = max(1, max((s for s, l in enumerate(distLens) if l), default=0) + 1)
+        # each array run-length encoded on its own: no repeat crosses into the distance code lengths,
+        # valid deflate but rejected by decoders that read the two arrays separately
+        runs = runLengths(litLens[:hlit]) + runLengths(distLens[:hdist])
+
+        clenFreq = [0] * 19
+        for symbol, extra in runs:
+            clenFreq[symbol] += 1
+        clenLens = codeLengths(clenFreq, 7)
+
+        hclen = 19
+        while hclen > 4 and clenLens[CLEN_ORDER[hclen - 1]] == 0:
+            hclen -= 1
+
+        bits = 5 + 5 + 4 + 3 * hclen
+        bits += sum(clenLens[s] + (2, 3, 7)[s - 16] if s >= 16 else clenLens[s] for s, e in runs)
+        return hlit, hdist, hclen, clenLens, runs, bits
+
+    def _writeSymbols(self, w, tokens, litLens, distLens):
+        litCodes = writerCodes(litLens)
+        distCodes = writerCodes(distLens)
+        writeBits = w.writeBits
+        for t in tokens:
+            if t < 256:
+                writeBits(litCodes[t], litLens[t])
+            else:
+                length = t >> 15
+                code = LENGTH_SYMBOL[length]
+                writeBits(litCodes[257 + code], litLens[257 + code])
+                if LENGTH_EXTRA[code]:
+                    writeBits(length - LENGTH_BASE[code], LENGTH_EXTRA[code])
+                dist = (t & 0x7FFF) + 1
+                code = DIST_SYMBOL[dist - 1]
+                writeBits(distCodes[code], distLens[code])
+                if DIST_EXTRA[code]:
+                    writeBits(dist - DIST_BASE[code], DIST_EXTRA[code])
+        writeBits(litCodes[256], litLens[256])
+
+    def _writeStored(self, w, data, final):
+        ''' writes data as stored blocks (BTYPE=0), 65535 bytes at most each '''
+        for i in range(0, max(len(data), 1), MAX_STORED):
+            chunk = data[i:i + MAX_STORED]
+            last = final and i + MAX_STORED >= len(data)
+            w.writeBits(1 if last else 0, 1)
+            w.writeBits(0, 2)
+            w.alignToByte()
+            w.writeBytes(len(chunk).to_bytes(2, 'little') + (len(chunk) ^ 0xFFFF).to_bytes(2, 'little'))
+            w.writeBytes(chunk)
+
+    def _writeBlock(self, w, data, tokens, start, end, final):
+        ''' writes one block with the cheapest of the three block types '''
+        litFreq, distFreq = self._frequencies(tokens)
+        if not any(distFreq):
+            distFreq[0] = 1  # at least one distance code (as zlib does)
+
+        litLens = codeLengths(litFreq, 15)
+        distLens = codeLengths(distFreq, 15)
+        hlit, hdist, hclen, clenLens, runs, headerBits = self._dynamicHeader(litLens, distLens)
+
+        dynamicBits = 3 + headerBits + self._dataBits(litFreq, distFreq, litLens, distLens)
+        fixedBits = 3 + self._dataBits(litFreq, distFreq, FIXED_LITLEN_LENS, FIXED_DIST_LENS)
+        storedBits = (end - start + 5 * ((end - start) // MAX_STORED + 1)) * 8 + 7
+
+        if storedBits <= min(dynamicBits, fixedBits):
+            self._writeStored(w, data[start:end], final)
+
+        elif fixedBits <= dynamicBits:
+            w.writeBits(final, 1)
+            w.writeBits(1, 2)
+            self._writeSymbols(w, tokens, FIXED_LITLEN_LENS, FIXED_DIST_LENS)
+
+        else:
+            w.writeBits(final, 1)
+            w.writeBits(2, 2)
+            w.writeBits(hlit - 257, 5)
+            w.writeBits(hdist - 1, 5)
+            w.writeBits(hclen - 4, 4)
+            for i in range(hclen):
+                w.writeBits(clenLens[CLEN_ORDER[i]], 3)
+
+            clenCodes = writerCodes(clenLens)
+            for symbol, extra in runs:
+                w.writeBits(clenCodes[symbol], clenLens[symbol])
+                if symbol >= 16:
+                    w.writeBits(extra, (2, 3, 7)[symbol - 16])
+
+            self._writeSymbols(w, tokens, litLens, distLens)
+
+    def compress(self, data):
+        ''' returns data compressed as a raw DEFLATE stream '''
+        data = bytes(data)
+        w = BitWriter()
+
+        if self.level == 0:
+            self._writeStored(w, data, 1)
+            return w.getvalue()
+
+        blocks = self._tokens(data)
+        block = next(blocks)
+        for nextBlock in blocks:
+            self._writeBlock(w, data, *block, 0)
+            block = nextBlock
+        self._writeBlock(w, data, *block, 1)
+        return w.getvalue()
+
+
+def compressGzip(data, level=6, fName='', mTime=0):
+    ''' returns data compressed as a GZIP member (header, DEFLATE stream and CRC32/ISIZE trailer) '''
+
+    gzh = GZIPHeader()
+    gzh.fName = fName
+    gzh.mTime = mTime
+    gzh.XFL = 2 if level == 9 else 4 if level == 1 else 0
+    gzh.OS = 255  # unknown
+
+    trailer = crc32(data).to_bytes(4, 'little') + (len(data) & 0xFFFFFFFF).to_bytes(4, 'little')
+    return gzh.toBytes() + Deflater(level).compress(data) + trailer
+
+
+def compressFile(fileName, level=6):
+    ''' compresses fileName into fileName.gz. Returns (original size, compressed size, seconds) '''
+
+    with open(fileName, 'rb') as f:
+        data = f.read()
+
+    t = time.perf_counter()
+    gz = compressGzip(data, level, os.path.basename(fileName), int(os.path.getmtime(fileName)))
+    elapsed = time.perf_counter() - t
+
+    with open(fileName + '.gz', 'wb') as f:
+        f.write(gz)
+    return len(data), len(gz), elapsed
+
+
+def levelReport(data):
+    ''' compresses data with every level, checks the round trip through the pure-Python decoder of GZIP and
+        returns a list of (level, compressed size, ratio, MB/s) '''
+    from gzip import GZIP
+
+    report = []
+    for level in range(10):
+        t = time.perf_counter()
+        gz = compressGzip(data, level)
+        elapsed = time.perf_counter() - t
+        if b''.join(GZIP(gz, backend='python').decompressChunks()) != data:
+            raise ValueError('Error: level %d does not round trip' % level)
+        report.append((level, len(gz), len(gz) / max(len(data), 1), len(data) / 1e6 / max(elapsed, 1e-9)))
+    return report
+
+
+if __name__ == '__main__':
+
+    # usage: deflate.py [-0 .. -9 | --levels] file
+    level = 6
+    args = sys.argv[1:]
+    if args and args[0] == '--levels':
+        with open(args[1], 'rb') as f:
+            for level, compressedSize, ratio, speed in levelReport(f.read()):
+                print("level %d: %d bytes, ratio %.3f, %.3f MB/s" % (level, compressedSize, ratio, speed))
+        sys.exit(0)
+
+    if args and args[0].startswith('-') and args[0][1:].isdigit():
+        level = int(args.pop(0)[1:])
+    fileName = args[0] if args else "FAQ.txt"
+
+    size, compressedSize, elapsed = compressFile(fileName, level)
+    print("%s.gz: level %d, %d -> %d bytes (ratio %.3f), %.3f MB/s"
+          % (fileName, level, size, compressedSize, compressedSize / max(size, 1), size / 1e6 / max(elapsed, 1e-9)))
@@ -0,0 +1,40 @@
+# Teoria da Informacao, LEI, 2022
+# Errors of the GZIP / DEFLATE decoder: what is wrong with the compressed data, and where
+
+
+class GZIPError(ValueError):
+    ''' invalid or damaged compressed data. A ValueError, as every error of the decoder
+        always was, so that handlers of ValueError keep working; the subclasses tell
+        which part of the stream is wrong '''
+
+
+class HeaderError(GZIPError):
+    ''' not a GZIP (or zlib) header, a header that fails its CRC, or a missing or wrong
+        preset dictionary '''
+
+
+class BlockError(GZIPError):
+    ''' invalid deflate block: reserved block type, stored block with LEN != ~NLEN,
+        or invalid data found by a compiled backend '''
+
+
+class CodeSetError(BlockError):
+    ''' invalid Huffman codes: too many code lengths, an over-subscribed or incomplete
+        set of lengths, a repeat with nothing to repeat, no end-of-block code, or bits
+        that are not a code of the set '''
+
+
+class DistanceTooFarError(BlockError):
+    ''' a match reaching back before the first byte decoded (or of the preset dictionary) '''
+
+
+class ChecksumError(GZIPError):
+    ''' CRC32, ISIZE or Adler-32 of the data decoded differs from the trailer '''
+
+
+class TruncatedError(GZIPError, EOFError):
+    ''' the compressed data ends before the stream does. Also an EOFError: incremental
+        decoders (gzstream.GZIPDecompressor) wait for more data when they get it '''
+
+    def __init__(self, message="Fim inesperado do ficheiro."):
+        GZIPError.__init__(self, message)
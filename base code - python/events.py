@@ -0,0 +1,135 @@
+# Teoria da Informacao, LEI, 2022
+# Instrumentation of the GZIP decoder: events of members and blocks, and profiling
+
+import cProfile
+import io
+import pstats
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+
+class BlockStats:
+    ''' what was measured in one deflate block: type, position and size in bits, decompressed
+        bytes and the time spent in each phase ('header', 'tables', 'lz77', 'stored').
+        When the events ask for symbols, also the number of literals and matches and the
+        histograms of match lengths and distances (None otherwise) '''
+
+    def __init__(self, number, startBit, outStart, symbols=False):
+        self.number = number  # 1 for the first block of the member
+        self.btype = -1
+        self.startBit = self.endBit = startBit
+        self.outStart = outStart  # decompressed bytes before the block
+        self.outBytes = 0
+        self.phases = {}
+        self.literals = self.matches = 0
+        self.lengths = Counter() if symbols else None
+        self.distances = Counter() if symbols else None
+        self._time = time.perf_counter()
+
+    @property
+    def bits(self):
+        ''' compressed size of the block in bits '''
+        return self.endBit - self.startBit
+
+    def mark(self, phase):
+        ''' adds the time since the previous mark to phase '''
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._time
+        self._time = now
+
+
+class DecoderEvents:
+    ''' receives the events of a GZIP decoder (GZIP(..., events=...)). Every method does nothing:
+        subclass it and override the ones of interest. Without events (the default) the decoder
+        only tests for them once per block. symbols = True makes the decoder count literals,
+        matches, lengths and distances, decoding symbol by symbol (much slower) '''
+
+    symbols = False
+
+    def memberStart(self, gz):
+        ''' the header of a member was read (gz.gzh, gz.memberStart) '''
+
+    def blockStart(self, gz, stats):
+        ''' BFINAL and BTYPE of a block were read (stats.number, stats.btype, stats.startBit) '''
+
+    def dynamicTrees(self, gz, hlit, hdist, hclen, clenLens, litlenLens, distLens):
+        ''' the code lengths of a dynamic block were read '''
+
+    def blockEnd(self, gz, stats):
+        ''' a block was decoded (BlockStats complete) '''
+
+    def memberEnd(self, gz, member):
+        ''' the trailer of a member was read and checked (GZIPMember) '''
+
+    def streamEnd(self, gz):
+        ''' every member was decoded (gz.members) '''
+
+
+class EventLog(DecoderEvents):
+    ''' keeps the BlockStats of every block and the members decoded '''
+
+    def __init__(self, symbols=False):
+        self.symbols = symbols
+        self.blocks = []
+        self.members = []
+
+    def blockEnd(self, gz, stats):
+        self.blocks.append(stats)
+
+    def memberEnd(self, gz, member):
+        self.members.append(member)
+
+    def summary(self):
+        ''' totals of the blocks logged, as a dict '''
+        phases = Counter()
+        for b in self.blocks:
+            phases.update(b.phases)
+        summary = {'members': len(self.members), 'blocks': len(self.blocks),
+                   'bits': sum(b.bits for b in self.blocks), 'outBytes': sum(b.outBytes for b in self.blocks),
+                   'blockTypes': dict(Counter(b.btype for b in self.blocks)), 'phases': dict(phases)}
+        if self.symbols:
+            lengths, distances = Counter(), Counter()
+            for b in self.blocks:
+                lengths.update(b.lengths)
+                distances.update(b.distances)
+            summary.update(literals=sum(b.literals for b in self.blocks), matches=sum(b.matches for b in self.blocks),
+                           lengths=dict(lengths), distances=dict(distances))
+        return summary
+
+
+class Profiler:
+    ''' context manager: runs the code inside under cProfile (cpu) and/or tracemalloc (memory)
+        and writes a report to stream when it ends. Meant for one file at a time '''
+
+    def __init__(self, cpu=True, memory=True, top=20, stream=None):
+        self.cpu = cpu
+        self.memory = memory
+        self.top = top
+        self.stream = stream
+        self.profile = None
+
+    def __enter__(self):
+        if self.memory:
+            tracemalloc.start()
+        if self.cpu:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        stream = self.stream or sys.stderr
+        if self.cpu:
+            self.profile.disable()
+            report = io.StringIO()
+            pstats.Stats(self.profile, stream=report).sort_stats('cumulative').print_stats(self.top)
+            stream.write(report.getvalue())
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            stream.write("Memory: %d KiB allocated, %d KiB peak\n" % (current >> 10, peak >> 10))
+            for stat in snapshot.statistics('lineno')[:self.top]:
+                stream.write("  %s\n" % stat)
+        return False
@@ -0,0 +1,69 @@
+# Teoria da Informacao, LEI, 2022
+# Random access index for gzip files (zran style): checkpoints at block boundaries
+# with the compressed bit position and the 32 KiB of history needed to resume inflation
+
+import bisect
+import struct
+
+
+class Checkpoint:
+    ''' point where inflation can resume: start of a deflate block '''
+
+    def __init__(self, out, bit, window):
+        self.out = out  # offset in the decompressed data
+        self.bit = bit  # offset in the compressed data, in bits (byte = bit >> 3, bits to skip = bit & 7)
+        self.window = window  # last 32 KiB of decompressed data before out
+
+
+class GZIPIndex:
+    ''' list of checkpoints, about one every span bytes of decompressed data.
+        Saved as a sidecar file: header (magic, span, size, count) followed by the checkpoints '''
+
+    MAGIC = b'GZIDX1'
+    HEADER = struct.Struct('<6sQQI')
+    ENTRY = struct.Struct('<QQI')
+
+    def __init__(self, span=1 << 20):
+        self.span = span
+        self.size = 0  # decompressed size, known once the index is complete
+        self.checkpoints = []
+        self.outs = []  # checkpoint.out of every checkpoint, for bisect
+
+    def nextCheckpoint(self):
+        ''' decompressed offset from which the next checkpoint should be added '''
+        return self.outs[-1] + self.span if self.outs else 0
+
+    def add(self, out, bit, window):
+        self.checkpoints.append(Checkpoint(out, bit, window))
+        self.outs.append(out)
+
+    def find(self, offset):
+        ''' returns the last checkpoint at or before the decompressed offset '''
+        i = bisect.bisect_right(self.outs, offset) - 1
+        return self.checkpoints[max(i, 0)]
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.span, self.size, len(self.checkpoints)))
+            for cp in self.checkpoints:
+                f.write(self.ENTRY.pack(cp.out, cp.bit, len(cp.window)))
+                f.write(cp.window)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, span, size, count = cls.HEADER.unpack_from(data, 0)
+        if magic != cls.MAGIC:
+            raise ValueError('Error: %s is not a gzip index' % path)
+
+        index = cls(span)
+        index.size = size
+        pos = cls.HEADER.size
+        for i in range(count):
+            out, bit, wlen = cls.ENTRY.unpack_from(data, pos)
+            pos += cls.ENTRY.size
+            index.add(out, bit, data[pos:pos + wlen])
+            pos += wlen
+        return index
@@ -2,8 +2,22 @@
 # Adapted from Java's implementation of Rui Pedro Paiva
 # Teoria da Informacao, LEI, 2022
 
+import io
+import json
+import mmap
+import os
+import struct
 import sys
-from huffmantree import HuffmanTree
+from concurrent.futures import ProcessPoolExecutor
+from bitreader import BitReader, MASKS
+from checksum import crc32
+from errors import (BlockError, ChecksumError, CodeSetError, DistanceTooFarError, GZIPError, HeaderError,
+                    TruncatedError)
+from events import BlockStats, DecoderEvents, Profiler
+from gzindex import GZIPIndex
+from huffmantree import HuffmanTree, HuffmanTable, HuffmanTableCache
+from inflate import PYTHON_BACKEND, getBackend
+from window import BufferWindow, SlidingWindow
 
 def traverse(arr, node, current_code):
     if node.isLeaf():
@@ -17,59 +31,111 @@ def traverse(arr, node, current_code):
         traverse(arr, node.right, current_code + '1')  
 
 class GZIPHeader:
-    ''' class for reading and storing GZIP header fields '''
+    ''' class for reading and storing GZIP header fields (one instance per member) '''
 
-    ID1 = ID2 = CM = FLG = XFL = OS = 0
-    MTIME = []
-    lenMTIME = 4
-    mTime = 0
-
-    # bits 0, 1, 2, 3 and 4, respectively (remaining 3 bits: reserved)
-    FLG_FTEXT = FLG_FHCRC = FLG_FEXTRA = FLG_FNAME = FLG_FCOMMENT = 0
+    __slots__ = ('ID1', 'ID2', 'CM', 'FLG', 'mTime', 'XFL', 'OS',
+                 'FLG_FTEXT', 'FLG_FHCRC', 'FLG_FEXTRA', 'FLG_FNAME', 'FLG_FCOMMENT',
+                 'extraField', 'fName', 'fComment', 'HCRC', 'headerCRC', '_subfields')
 
-    # FLG_FTEXT --> ignored (usually 0)
-    # if FLG_FEXTRA == 1
-    XLEN, extraField = [], []
+    FIXED = struct.Struct('<BBBBIBB')  # ID1 ID2 CM FLG MTIME(4) XFL OS
+    SUBFIELD = struct.Struct('<2sH')  # SI1 SI2 LEN of a FEXTRA subfield
+    MAGIC = b'\x1f\x8b\x08'  # ID1 ID2 and CM (deflate)
+    lenMTIME = 4
     lenXLEN = 2
+    READ_SIZE = 512  # bytes looked at first: usually the whole header (FNAME and FCOMMENT are short)
 
-    # if FLG_FNAME == 1
-    fName = ''  # ends when a byte with value 0 is read
-
-    # if FLG_FCOMMENT == 1
-    fComment = ''  # ends when a byte with value 0 is read
+    def __init__(self):
+        self.ID1 = self.ID2 = self.CM = self.FLG = self.XFL = self.OS = 0
+        self.mTime = 0
 
-    # if FLG_HCRC == 1
-    HCRC = []
+        # bits 0, 1, 2, 3 and 4, respectively (remaining 3 bits: reserved)
+        # FLG_FTEXT --> ignored (usually 0)
+        self.FLG_FTEXT = self.FLG_FHCRC = self.FLG_FEXTRA = self.FLG_FNAME = self.FLG_FCOMMENT = 0
+
+        # if FLG_FEXTRA == 1: XLEN bytes, subfields decoded only when asked for (subfields)
+        self.extraField = b''
+        self._subfields = None
+
+        # if FLG_FNAME == 1 / FLG_FCOMMENT == 1: end with a byte with value 0
+        self.fName = ''
+        self.fComment = ''
+
+        # if FLG_HCRC == 1
+        self.HCRC = b''
+        self.headerCRC = -1  # CRC16 computed over the header bytes read
+
+    @property
+    def MTIME(self):
+        ''' the 4 bytes of MTIME (LSB first) '''
+        return list(self.mTime.to_bytes(self.lenMTIME, 'little'))
+
+    @property
+    def xlen(self):
+        return len(self.extraField)
+
+    @property
+    def XLEN(self):
+        ''' the 2 bytes of XLEN (LSB first) '''
+        return list(self.xlen.to_bytes(self.lenXLEN, 'little'))
+
+    @property
+    def subfields(self):
+        ''' FEXTRA subfields as a list of (SI1 SI2, data), decoded on first use.
+            Raises HeaderError if they do not fill the extra field exactly '''
+        if self._subfields is None:
+            extra = self.extraField
+            fields = []
+            i = 0
+            while i + 4 <= len(extra):
+                si, length = self.SUBFIELD.unpack_from(extra, i)
+                if i + 4 + length > len(extra):
+                    break
+                fields.append((si, extra[i + 4:i + 4 + length]))
+                i += 4 + length
+            if i != len(extra):
+                raise HeaderError('Error: invalid FEXTRA subfields')
+            self._subfields = fields
+        return self._subfields
 
     def read(self, f):
-        ''' reads and processes the Huffman header from file. Returns 0 if no error, -1 otherwise '''
-
-        # ID 1 and 2: fixed values
-        self.ID1 = f.read(1)[0]
-        if self.ID1 != 0x1f: return -1  # error in the header
+        ''' reads and processes the GZIP header from a BitReader. Returns 0 if no error, -1 otherwise.
+            Raises TruncatedError if the stream ends inside the header '''
 
-        self.ID2 = f.read(1)[0]
-        if self.ID2 != 0x8b: return -1  # error in the header
+        size = self.READ_SIZE
+        while True:
+            data = f.peekBytes(size)
+            try:
+                end = self.parse(data)
+                break
+            except EOFError:
+                if len(data) < size:  # the stream ends inside the header
+                    raise
+                size *= 4
+
+        if end < 0:
+            return -1  # error in the header
+        f.readBytes(end)
+        return 0
 
-        # CM - Compression Method: must be the value 8 for deflate
-        self.CM = f.read(1)[0]
-        if self.CM != 0x08: return -1  # error in the header
+    def parse(self, data, pos=0):
+        ''' processes the header at data[pos:] (bytes). Returns the position after it, or -1 if it
+            is not a GZIP header for deflate. Raises TruncatedError if data ends inside the header '''
 
-        # Flags
-        self.FLG = f.read(1)[0]
+        # ID1 ID2 CM checked with the bytes there are: a short input that is not gzip is not a truncated header
+        start = data[pos:pos + len(self.MAGIC)]
+        if start != self.MAGIC[:len(start)]:
+            return -1  # error in the header
 
-        # MTIME
-        self.MTIME = [0] * self.lenMTIME
-        self.mTime = 0
-        for i in range(self.lenMTIME):
-            self.MTIME[i] = f.read(1)[0]
-            self.mTime += self.MTIME[i] << (8 * i)
+        end = pos + 10
+        if len(data) < end:
+            raise TruncatedError()
 
-        # XFL (not processed...)
-        self.XFL = f.read(1)[0]
+        # fixed part of the header: ID1 ID2 CM FLG MTIME(4) XFL OS
+        self.ID1, self.ID2, self.CM, self.FLG, self.mTime, self.XFL, self.OS = self.FIXED.unpack_from(data, pos)
 
-        # OS (not processed...)
-        self.OS = f.read(1)[0]
+        # ID 1 and 2: fixed values; CM - Compression Method: must be the value 8 for deflate
+        if self.ID1 != 0x1f or self.ID2 != 0x8b or self.CM != 0x08:
+            return -1  # error in the header
 
         # --- Check Flags
         self.FLG_FTEXT = self.FLG & 0x01
@@ -78,40 +144,118 @@ class GZIPHeader:
         self.FLG_FNAME = (self.FLG & 0x08) >> 3
         self.FLG_FCOMMENT = (self.FLG & 0x10) >> 4
 
-        # FLG_EXTRA
+        # FLG_EXTRA: XLEN (2 bytes, LSB first) + XLEN bytes of extra field
         if self.FLG_FEXTRA == 1:
-            # read 2 bytes XLEN + XLEN bytes de extra field
-            # 1st byte: LSB, 2nd: MSB
-            self.XLEN = [0] * self.lenXLEN
-            self.XLEN[0] = f.read(1)[0]
-            self.XLEN[1] = f.read(1)[0]
-            #self.xlen = self.XLEN[1] << 8 + self.XLEN[0]
-            self.xlen = (self.XLEN[1] << 8) + self.XLEN[0]
-
-            # read extraField and ignore its values
-            self.extraField = f.read(self.xlen)
-
-        def read_str_until_0(f):
-            s = ''
-            while True:
-                c = f.read(1)[0]
-                if c == 0:
-                    return s
-                s += chr(c)
+            if len(data) < end + self.lenXLEN:
+                raise TruncatedError()
+            xlen = data[end] | (data[end + 1] << 8)
+            end += self.lenXLEN
+            if len(data) < end + xlen:
+                raise TruncatedError()
+            self.extraField = data[end:end + xlen]
+            self._subfields = None
+            end += xlen
 
         # FLG_FNAME
         if self.FLG_FNAME == 1:
-            self.fName = read_str_until_0(f)
+            self.fName, end = self._string(data, end)
 
         # FLG_FCOMMENT
         if self.FLG_FCOMMENT == 1:
-            self.fComment = read_str_until_0(f)
+            self.fComment, end = self._string(data, end)
 
-        # FLG_FHCRC (not processed...)
+        # FLG_FHCRC: the 2 least significant bytes of the CRC32 of the header
         if self.FLG_FHCRC == 1:
-            self.HCRC = f.read(2)
+            if len(data) < end + 2:
+                raise TruncatedError()
+            self.headerCRC = crc32(data[pos:end]) & 0xFFFF
+            self.HCRC = data[end:end + 2]
+            end += 2
+
+        return end
+
+    @staticmethod
+    def _string(data, pos):
+        ''' zero-terminated string at data[pos:]: returns it (latin-1) and the position after the 0 '''
+        try:
+            zero = data.index(0, pos)
+        except ValueError:
+            raise TruncatedError()
+        return data[pos:zero].decode('latin-1'), zero + 1
+
+    def toBytes(self):
+        ''' returns the header in GZIP format: ID1 ID2 CM FLG MTIME XFL OS, then FNAME and FCOMMENT
+            if set (FLG is computed from the fields present) '''
+
+        self.FLG_FNAME = 1 if self.fName else 0
+        self.FLG_FCOMMENT = 1 if self.fComment else 0
+        self.FLG = (self.FLG_FNAME << 3) | (self.FLG_FCOMMENT << 4)
+
+        header = bytearray([0x1f, 0x8b, 0x08, self.FLG])
+        header += (self.mTime & 0xFFFFFFFF).to_bytes(self.lenMTIME, 'little')
+        header += bytes([self.XFL, self.OS])
+        if self.FLG_FNAME == 1:
+            header += self.fName.encode('latin-1') + b'\x00'
+        if self.FLG_FCOMMENT == 1:
+            header += self.fComment.encode('latin-1') + b'\x00'
+        return bytes(header)
 
-        return 0
+
+class GZIPMember:
+    ''' entry of the member index built while decoding: where a member starts in the
+        compressed data, its header and its sizes '''
+
+    def __init__(self, offset, header):
+        self.offset = offset  # byte offset of the member's header in the compressed data
+        self.header = header  # GZIPHeader of the member
+        self.compressedSize = -1  # bytes from the header to the end of the trailer
+        self.size = -1  # decompressed size
+        self.CRC32 = self.ISIZE = -1  # trailer
+        self.numBlocks = 0
+        self.blocks = None  # BlockStats of its blocks (see GZIP.scan)
+
+
+class VerboseEvents(DecoderEvents):
+    ''' events that print what the decoder reads, as in the exercises: original size and file name,
+        HLIT/HDIST/HCLEN and the code lengths of every dynamic block, and the number of blocks '''
+
+    def memberStart(self, gz):
+        if not gz.members:
+            # get original file size: size of file before compression
+            print(gz.getOrigFileSize())
+
+            # show filename read from GZIP header
+            print(gz.gzh.fName)
+
+    def dynamicTrees(self, gz, hlit, hdist, hclen, clenLens, litlenLens, distLens):
+        print("-----------  EX 1  -----------")
+        print(f"HLIT: {hlit}, HDIST: {hdist}, HCLEN: {hclen}")
+
+        print("-----------  EX 2  -----------")
+        print(clenLens)
+
+        print("-----------  EX 3  -----------")
+        byte_array = [''] *64
+        traverse(byte_array, gz.huffmanFromLens(clenLens, 7).root, "")
+        print(byte_array)
+
+        print("-----------  EX 4  -----------")
+        dict_hdist = {}
+        for numero in litlenLens:
+            if numero in dict_hdist:
+                dict_hdist[numero] += 1
+            else:
+                dict_hdist[numero] = 1
+
+        print(dict_hdist)
+
+        print("-----------  EX 5  -----------")
+        print(distLens)
+
+    def streamEnd(self, gz):
+        if len(gz.members) > 1:
+            print("%d member(s)" % len(gz.members))
+        print("End: %d block(s) analyzed." % sum(m.numBlocks for m in gz.members))
 
 
 class GZIP:
@@ -119,19 +263,82 @@ class GZIP:
 
     gzh = None
     gzFile = ''
+    fileStart = 0
     fileSize = origFileSize = -1
     numBlocks = 0
+    blockNumber = 0  # block being decoded by the pure-Python decoder (0 outside the blocks)
     f = None
-
-    bits_buffer = 0
-    available_bits = 0
-
-    def __init__(self, filename):
-        self.gzFile = filename
-        self.f = open(filename, 'rb')
-        self.f.seek(0, 2)
-        self.fileSize = self.f.tell()
-        self.f.seek(0)
+    ownsFile = False
+    reader = None
+    verbose = False
+    verify = True
+    CRC32 = ISIZE = -1  # trailer of the member
+    memberStart = memberSize = -1
+    outTotal = 0  # decompressed bytes of the members decoded so far
+    index = None  # GZIPIndex being built (see buildIndex)
+    backend = PYTHON_BACKEND  # inflater of the deflate blocks (see inflate.py)
+    events = None  # DecoderEvents receiving the events of members and blocks (see events.py)
+    blockStats = None  # BlockStats of the block being decoded, when there are events
+    output = None  # window shared by every member (see decompressInto / decompressTo); None: one per member
+    map = view = None  # memory map of the input and its memoryview (memoryMap=True)
+
+    # decode tables of recent dynamic blocks, shared by every GZIP object (None disables it).
+    # tableCache.hits / tableCache.misses count the blocks that reused / built a table
+    tableCache = HuffmanTableCache(64)
+
+    def __init__(self, source, verbose=False, verify=True, backend=None, events=None, memoryMap=False):
+        ''' source: file name, binary file object or bytes-like buffer with the gzip data.
+            verify=False skips the CRC32/ISIZE/header CRC checks (trusted inputs).
+            backend: name of the inflate backend ('python', 'zlib', 'isal'); None picks the fastest
+            available. The pure-Python decoder is used anyway when there are events (they need blocks).
+            events: DecoderEvents notified of every member and block; verbose=True without events
+            prints the details of every block, as the exercises do (VerboseEvents; off by default).
+            memoryMap=True maps a (non empty) input file in memory and decodes straight from it;
+            ignored for inputs that are not files (bytes, BytesIO) '''
+        if isinstance(source, (str, os.PathLike)):
+            self.gzFile = source
+            self.f = open(source, 'rb')
+            self.ownsFile = True
+        elif hasattr(source, 'read'):
+            name = getattr(source, 'name', '')  # an int for files opened from a descriptor: no name
+            self.gzFile = os.fsdecode(name) if isinstance(name, (str, bytes, os.PathLike)) else ''
+            self.f = source
+        else:
+            self.f = io.BytesIO(source)
+
+        if self.f.seekable():
+            self.fileStart = self.f.tell()
+            self.f.seek(0, 2)
+            self.fileSize = self.f.tell() - self.fileStart
+            self.f.seek(self.fileStart)
+
+        self.verbose = verbose
+        self.verify = verify
+        self.events = events if events is not None else (VerboseEvents() if verbose else None)
+        self.backend = getBackend(backend)
+        self.members = []
+        fileno = self._fileno() if memoryMap and self.fileSize > 0 else None
+        if fileno is not None:
+            self.map = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)[self.fileStart:self.fileStart + self.fileSize]
+        self.reader = BitReader(self.view if self.view is not None else self.f)
+
+    def _fileno(self):
+        ''' file descriptor of the input, or None if it has none (bytes, BytesIO): then it is not mapped '''
+        try:
+            return self.f.fileno()
+        except (OSError, ValueError):  # io.UnsupportedOperation is both
+            return None
+
+    def _readerAt(self, byte):
+        ''' returns a BitReader at byte of the gzip stream (from the memory map, if there is one) '''
+        if self.view is not None:
+            reader = BitReader(self.view[byte:])
+        else:
+            self.f.seek(self.fileStart + byte)
+            reader = BitReader(self.f)
+        reader.offset = byte
+        return reader
 
 
     ### Exercício 1 a 8 ###
@@ -150,66 +357,50 @@ class GZIP:
             clen_len[idx[i]] = temp
         return clen_len
 
-    def huffmanFromLens(self, lenArray):
+    @staticmethod
+    def huffmanFromLens(lenArray, rootBits=9, buildTree=True, cache=None):
+        ''' builds the canonical Huffman code of the code lengths: a HuffmanTable for decoding and,
+            if buildTree, the node tree (for traverse/nextNode, when teaching or debugging).
+            cache: HuffmanTableCache to take the table from '''
         htr = HuffmanTree()
-        max_len = max(lenArray)
-        max_symbol = len(lenArray)
-        
-        bl_count = [0 for i in range(max_len+1)]
-        for N in range(1, max_len+1):
-            bl_count[N] += lenArray.count(N)
-
-        code = 0
-        next_code = [0 for i in range(max_len+1)]
-        for bits in range(1, max_len+1):
-            code = (code + bl_count[bits-1]) << 1
-            next_code[bits] = code
-  
-        for n in range(max_symbol):
-            length = lenArray[n]
-            if(length != 0):
-                code = bin(next_code[length])[2:]
-                extension = "0"*(length-len(code)) 
-                htr.addNode(extension + code, n, False)
-                next_code[length] += 1
-        
-        return htr;
+        htr.table = cache.get(lenArray, rootBits) if cache is not None else HuffmanTable(lenArray, rootBits)
+
+        if buildTree:
+            codes = htr.table.codes
+            for n, length in enumerate(lenArray):
+                if length != 0:
+                    htr.addCode(codes[n], length, n)
+
+        return htr
 
     def treeCodeLens(self, size, hufftree):
         # Array que irá armazenar os comprimentos dos códigos de Huffman
         ht_lens = [] 
-        prev = 0  # Variável para armazenar o código anterior, usada em alguns casos específicos
+        prev = -1  # Comprimento anterior, repetido pelo código 16 (-1: ainda não há nenhum)
 
         # Loop até que o array 'ht_lens' atinja o tamanho desejado
         while (len(ht_lens) < size):
-            hufftree.resetCurNode()  # Reinicia o nó atual da árvore de Huffman
-
-            # Variável para verificar se o próximo nó foi encontrado
-            found = False
-            
-            # Procura pelo próximo nó
-            while(not found):
-                # Lê um bit e tenta seguir para o próximo nó da árvore de Huffman com base no bit lido
-                bit = self.readBits(1)  
-                codigo = hufftree.nextNode(str(bit))  # Obtém o código associado ao nó atual
-                if(codigo != -1 and codigo != -2):  # Verifica se o código é válido (diferente de -1 e -2)
-                    found = True  # Se encontrou um código válido, termina a procura
+            codigo = self._read_huffman_code(hufftree)  # Lê o próximo código da árvore de Huffman
 
             # Caso o código seja 18 (indicado para 7 bits extra), lê mais 7 bits
             if(codigo == 18): 
                 amount = self.readBits(7)  # Lê os 7 bits extras
                 # Adiciona 0 ao array 'ht_lens' para o comprimento do código, ajustando com base nos bits lidos
                 ht_lens += [0]*(11 + amount)
+                prev = 0
 
             # Caso o código seja 17 (indicado para 3 bits extra), lê mais 3 bits
             if(codigo == 17):
                 amount = self.readBits(3)  # Lê os 3 bits extras
                 # Adiciona 0 ao array 'ht_lens' para o comprimento do código, ajustando com base nos bits lidos
                 ht_lens += [0]*(3 + amount)
+                prev = 0
 
             # Caso o código seja 16 (indicado para 2 bits extra), lê mais 2 bits
             if(codigo == 16):
                 amount = self.readBits(2)  # Lê os 2 bits extras
+                if prev < 0:
+                    raise CodeSetError("Invalid bit length repeat")
                 # Adiciona ao array 'ht_lens' o valor do código anterior ajustado com base nos bits lidos
                 ht_lens += [prev]*(3 + amount)
 
@@ -218,6 +409,10 @@ class GZIP:
                 ht_lens += [codigo]
                 prev = codigo  # Atualiza o código anterior
 
+        # Uma repetição não pode passar do número de comprimentos pedido
+        if len(ht_lens) > size:
+            raise CodeSetError("Invalid bit length repeat")
+
         # Retorna o array contendo os comprimentos dos códigos de Huffman
         return ht_lens
 
@@ -225,25 +420,213 @@ class GZIP:
     def decompress_LZ77(self, huffman_tree_litlen, huffman_tree_dist, out):
         """
         Função principal para descompressão LZ77.
-        Lê os códigos de comprimento/literal e distância e descomprime os dados.
+        Lê os códigos de comprimento/literal e distância e descomprime os dados
+        para a janela deslizante out (SlidingWindow).
+        Usa o ciclo rápido (_inflate_fast) enquanto houver bytes de entrada suficientes
+        no buffer do leitor, e o caminho cuidadoso (_inflate_symbol, símbolo a símbolo
+        através do BitReader) junto ao fim do buffer ou quando as árvores não têm tabela.
         """
-        while True:
-            code_litlen = self._read_huffman_code(huffman_tree_litlen)
+        stats = self.blockStats
+        if stats is not None and stats.lengths is not None:  # events counting symbols: careful path only
+            while not self._inflate_symbol(huffman_tree_litlen, huffman_tree_dist, out, stats):
+                pass
+            return out
+
+        fast = huffman_tree_litlen.table is not None and huffman_tree_dist.table is not None
+        reader = self.reader
 
-            if code_litlen == 256:  # Código de fim de bloco
+        while True:
+            if fast and self._inflate_fast(huffman_tree_litlen.table, huffman_tree_dist.table, out):
                 break
 
-            if code_litlen < 256:  # Literal
-                out.append(code_litlen)
-            else:  # Comprimento/Distância
-                length = self._calculate_length(code_litlen)
-                distance = self._calculate_distance(huffman_tree_dist)
-                for _ in range(length):
-                    out.append(out[-distance])
+            # Se os dados acabarem a meio do símbolo, o leitor volta ao início dele (a saída só
+            # é escrita depois de lido o símbolo inteiro): um descompressor incremental continua
+            # daqui quando chegarem mais dados
+            mark = reader.mark()
+            try:
+                if self._inflate_symbol(huffman_tree_litlen, huffman_tree_dist, out):
+                    break
+            except EOFError:
+                reader.reset(mark)
+                raise
 
         return out
 
+    def _inflate_fast(self, littable, disttable, out):
+        """
+        Ciclo rápido (equivalente ao inflate_fast do zlib): todo o estado do leitor e da
+        janela em variáveis locais, acumulador recarregado diretamente do buffer de entrada
+        e, quando a tabela o permite, dois literais curtos descodificados numa só consulta.
+        Pára, devolvendo False, quando restam menos de 8 bytes no buffer de entrada;
+        devolve True no fim do bloco.
+        """
+        reader = self.reader
+        inbuf = reader.buf
+        inpos = reader.pos
+        inend = len(inbuf) - 8
+        unpack64 = UINT64.unpack_from
+        bits = reader.bits_buffer
+        avail = reader.available_bits
+
+        littab = littable.table
+        litroot = littable.rootBits
+        litmask = MASKS[litroot]
+        pairs = littable.literalPairs()
+        disttab = disttable.table
+        distroot = disttable.rootBits
+        distmask = MASKS[distroot]
+        lbase, lextra, dbase, dextra = LENGTH_BASE, LENGTH_EXTRA, DIST_BASE, DIST_EXTRA
+        link = HuffmanTable.LINK
+
+        buf = out.buf
+        pos = out.pos
+        limit = out.limit
+        origin = out.origin
+        done = False
+
+        try:
+            while inpos <= inend:
+                if avail < 48:  # um símbolo completo (código, extra, distância, extra) ocupa até 48 bits
+                    n = (64 - avail) >> 3
+                    bits |= (unpack64(inbuf, inpos)[0] & MASKS[n << 3]) << avail
+                    inpos += n
+                    avail += n << 3
+
+                if pos > limit:  # Janela cheia: envia os dados e mantém só o histórico
+                    out.pos = pos
+                    if not out.slide():  # buffer de saída fixo: o resto vai pelo caminho cuidadoso
+                        break
+                    pos = out.pos
+                    origin = out.origin
+
+                entry = pairs[bits & litmask]
+                if entry:  # dois literais
+                    buf[pos] = entry & 0xFF
+                    buf[pos + 1] = (entry >> 8) & 0xFF
+                    pos += 2
+                    n = entry >> 16
+                    bits >>= n
+                    avail -= n
+                    continue
+
+                entry = littab[bits & litmask]
+                if entry & link:
+                    bits >>= litroot
+                    avail -= litroot
+                    entry = littab[(entry >> 5) + (bits & MASKS[entry & 15])]
+                if entry == 0:
+                    raise CodeSetError("Invalid literal/length code")
+                n = entry & 15
+                bits >>= n
+                avail -= n
+                symbol = entry >> 5
+
+                if symbol < 256:  # Literal
+                    buf[pos] = symbol
+                    pos += 1
+                    continue
+                if symbol == 256:  # Código de fim de bloco
+                    done = True
+                    break
+
+                # Comprimento/Distância
+                symbol -= 257
+                length = lbase[symbol]
+                n = lextra[symbol]
+                if n:
+                    length += bits & MASKS[n]
+                    bits >>= n
+                    avail -= n
+
+                entry = disttab[bits & distmask]
+                if entry & link:
+                    bits >>= distroot
+                    avail -= distroot
+                    entry = disttab[(entry >> 5) + (bits & MASKS[entry & 15])]
+                if entry == 0:
+                    raise CodeSetError("Invalid distance code")
+                n = entry & 15
+                bits >>= n
+                avail -= n
+                symbol = entry >> 5
+                distance = dbase[symbol]
+                n = dextra[symbol]
+                if n:
+                    distance += bits & MASKS[n]
+                    bits >>= n
+                    avail -= n
+
+                start = pos - distance
+                if start < origin:  # antes do início do membro (ou do histórico dado)
+                    raise DistanceTooFarError("Invalid distance too far back (%d)" % distance)
+                if length <= distance:  # Sem sobreposição: copia a fatia de uma vez
+                    buf[pos:pos + length] = buf[start:start + length]
+                    pos += length
+                elif distance == 1:  # Repetição de um só byte
+                    buf[pos:pos + length] = bytes((buf[start],)) * length
+                    pos += length
+                else:  # Sobreposição: duplica o padrão a cada cópia
+                    end = pos + length
+                    while pos < end:
+                        n = min(pos - start, end - pos)
+                        buf[pos:pos + n] = buf[start:start + n]
+                        pos += n
+        finally:  # também quando os dados são inválidos: a saída fica com tudo o que foi descodificado
+            reader.pos = inpos
+            reader.bits_buffer = bits
+            reader.available_bits = avail
+            out.pos = pos
+        return done
+
+    def _inflate_symbol(self, huffman_tree_litlen, huffman_tree_dist, out, stats=None):
+        """
+        Caminho cuidadoso: descodifica um só símbolo através dos métodos do BitReader,
+        que recarregam o buffer do ficheiro e detetam o fim dos dados.
+        Se stats (BlockStats) for dado, conta literais, comprimentos e distâncias.
+        Devolve True no fim do bloco.
+        """
+        code_litlen = self._read_huffman_code(huffman_tree_litlen)
+
+        if code_litlen == 256:  # Código de fim de bloco
+            return True
+
+        if code_litlen < 256:  # Literal
+            out.write(bytes((code_litlen,)))
+            if stats is not None:
+                stats.literals += 1
+        else:  # Comprimento/Distância
+            length = self._calculate_length(code_litlen)
+            distance = self._calculate_distance(huffman_tree_dist)
+            out.copyMatch(distance, length)
+            if stats is not None:
+                stats.matches += 1
+                stats.lengths[length] += 1
+                stats.distances[distance] += 1
+        return False
+
     def _read_huffman_code(self, huffman_tree):
+        """
+        Lê um código da árvore de Huffman fornecida.
+        Se a árvore tiver tabela de descodificação, espreita os próximos bits e
+        obtém símbolo e comprimento numa só consulta; caso contrário, percorre-a bit a bit.
+        """
+        hufftable = huffman_tree.table
+        if hufftable is None:
+            return self._walk_huffman_code(huffman_tree)
+
+        reader = self.reader
+        table = hufftable.table
+        root = hufftable.rootBits
+        entry = table[reader.peek(root)]
+        if entry & HuffmanTable.LINK:  # código mais longo que rootBits: sub-tabela
+            reader.consume(root)
+            entry = table[(entry >> 5) + reader.peek(entry & 15)]
+        if entry == 0:
+            raise CodeSetError("Invalid Huffman code")
+        reader.consume(entry & 15)
+        return entry >> 5
+
+    def _walk_huffman_code(self, huffman_tree):
         """
         Lê um código da árvore de Huffman fornecida bit a bit.
         """
@@ -252,210 +635,932 @@ class GZIP:
         while True:
             bit = str(self.readBits(1))
             code = huffman_tree.nextNode(bit)
-            if code != -1 and code != -2:  # Encontrou uma folha
+            if code == -1:  # Caminho que não leva a nenhum código
+                raise CodeSetError("Invalid Huffman code")
+            if code != -2:  # Encontrou uma folha
                 return code
 
     def _calculate_length(self, code_litlen):
         """
         Calcula o comprimento com base no código de comprimento/literal.
         """
-        extra_litlen_bits = [1, 1, 1, 1, 2, 2, 2, 2, 3, 3, 3, 3, 4, 4, 4, 4, 5, 5, 5, 5, 0]
-        extra_litlen_lens = [11, 13, 15, 17, 19, 23, 27, 31, 35, 43, 51, 59, 67, 83, 99, 115, 131, 163, 195, 227, 258]
-
-        if code_litlen < 265:
-            return code_litlen - 257 + 3
-
-        index = code_litlen - 265
-        extra_bits = self.readBits(extra_litlen_bits[index])
-        return extra_litlen_lens[index] + extra_bits
+        index = code_litlen - 257
+        extra = LENGTH_EXTRA[index]
+        return LENGTH_BASE[index] + (self.readBits(extra) if extra else 0)
 
     def _calculate_distance(self, huffman_tree_dist):
         """
         Calcula a distância com base na árvore de Huffman de distâncias.
         """
-        extra_dist_bits = [1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6, 7, 7, 8, 8, 9, 9, 10, 10, 11, 11, 12, 12, 13, 13]
-        extra_dist_lens = [5, 7, 9, 13, 17, 25, 33, 49, 65, 97, 129, 193, 257, 385, 513, 769, 1025, 1537, 2049, 3073, 4097, 6145, 8193, 12289, 16385, 24577]
-
         code_dist = self._read_huffman_code(huffman_tree_dist)
+        extra = DIST_EXTRA[code_dist]
+        return DIST_BASE[code_dist] + (self.readBits(extra) if extra else 0)
 
-        if code_dist < 4:
-            return code_dist + 1
-
-        index = code_dist - 4
-        extra_bits = self.readBits(extra_dist_bits[index])
-        return extra_dist_lens[index] + extra_bits
-
-    def decompress(self):
-        ''' main function for decompressing the gzip file with deflate algorithm '''
-
-        numBlocks = 0
+    def _scan_LZ77(self, huffman_tree_litlen, huffman_tree_dist):
+        """
+        Modo de inspeção (ver scan): percorre os símbolos de um bloco comprimido sem
+        produzir saída, i.e. sem janela, sem cópias e sem CRC, apenas somando os bytes
+        que cada literal e cada par comprimento/distância descomprimiriam.
+        Devolve o número de bytes que o bloco descomprime.
+        """
+        fast = huffman_tree_litlen.table is not None and huffman_tree_dist.table is not None
+        size = 0
 
-        # get original file size: size of file before compression
-        origFileSize = self.getOrigFileSize()
-        print(origFileSize)
+        while True:
+            if fast:
+                n, done = self._scan_fast(huffman_tree_litlen.table, huffman_tree_dist.table)
+                size += n
+                if done:
+                    return size
 
-        # read GZIP header
-        error = self.getHeader()
-        if error != 0:
-            print('Formato invalido!')
-            return
+            # Caminho cuidadoso junto ao fim do buffer de entrada
+            code_litlen = self._read_huffman_code(huffman_tree_litlen)
+            if code_litlen == 256:
+                return size
+            if code_litlen < 256:
+                size += 1
+            else:
+                size += self._calculate_length(code_litlen)
+                self._calculate_distance(huffman_tree_dist)
+
+    def _scan_fast(self, littable, disttable):
+        """
+        Ciclo rápido do modo de inspeção: o mesmo que _inflate_fast, mas os bits extra
+        das distâncias são saltados e nada é escrito.
+        Pára quando restam menos de 8 bytes no buffer de entrada. Devolve o número de
+        bytes descomprimidos contados e True no fim do bloco (False se parou antes).
+        """
+        reader = self.reader
+        inbuf = reader.buf
+        inpos = reader.pos
+        inend = len(inbuf) - 8
+        unpack64 = UINT64.unpack_from
+        bits = reader.bits_buffer
+        avail = reader.available_bits
+
+        littab = littable.table
+        litroot = littable.rootBits
+        litmask = MASKS[litroot]
+        pairs = littable.literalPairs()
+        disttab = disttable.table
+        distroot = disttable.rootBits
+        distmask = MASKS[distroot]
+        lbase, lextra, dextra = LENGTH_BASE, LENGTH_EXTRA, DIST_EXTRA
+        link = HuffmanTable.LINK
+
+        size = 0
+        done = False
+
+        while inpos <= inend:
+            if avail < 48:
+                n = (64 - avail) >> 3
+                bits |= (unpack64(inbuf, inpos)[0] & MASKS[n << 3]) << avail
+                inpos += n
+                avail += n << 3
+
+            entry = pairs[bits & litmask]
+            if entry:  # dois literais e, sem nada a escrever, logo os dois seguintes
+                n = entry >> 16
+                bits >>= n
+                entry = pairs[bits & litmask]
+                if entry:
+                    size += 4
+                    n += entry >> 16
+                    bits >>= entry >> 16
+                else:
+                    size += 2
+                avail -= n
+                continue
+
+            entry = littab[bits & litmask]
+            if entry & link:
+                bits >>= litroot
+                avail -= litroot
+                entry = littab[(entry >> 5) + (bits & MASKS[entry & 15])]
+            if entry == 0:
+                raise CodeSetError("Invalid literal/length code")
+            n = entry & 15
+            bits >>= n
+            avail -= n
+            symbol = entry >> 5
+
+            if symbol < 256:  # Literal
+                size += 1
+                continue
+            if symbol == 256:  # Código de fim de bloco
+                done = True
+                break
 
-        # show filename read from GZIP header
-        print(self.gzh.fName)
+            # Comprimento: base e bits extra; distância: só o código e os bits extra a saltar
+            symbol -= 257
+            n = lextra[symbol]
+            size += lbase[symbol] + (bits & MASKS[n])
+            bits >>= n
+            avail -= n
+
+            entry = disttab[bits & distmask]
+            if entry & link:
+                bits >>= distroot
+                avail -= distroot
+                entry = disttab[(entry >> 5) + (bits & MASKS[entry & 15])]
+            if entry == 0:
+                raise CodeSetError("Invalid distance code")
+            n = (entry & 15) + dextra[entry >> 5]
+            bits >>= n
+            avail -= n
+
+        reader.pos = inpos
+        reader.bits_buffer = bits
+        reader.available_bits = avail
+        return size, done
+
+    def readDynamicTrees(self):
+        ''' reads the header of a dynamic Huffman block (BTYPE=2) and returns the
+            literal/length and distance trees '''
+
+        # ex 1 --- Crie um método que leia o formato do bloco (i.e., devolva o valor 
+        # correspondente a HLIT, HDIST e HCLEN), de acordo com a estrutura de 
+        hlit, hdist, hlen = self.ex1()
+        if hlit > 29 or hdist > 29:  # no máximo 286 códigos de literais/comprimentos e 30 de distâncias
+            raise CodeSetError("Too many length or distance symbols")
+
+        # ex 2 --- Crie um método que armazene num array os comprimentos dos códigos 
+        # do “alfabeto de comprimentos de códigos”, com base em HCLEN: 
+        clen_code_lens = self.ex2(hlen)
+
+        # ex 3 --- Crie um método que converta os comprimentos dos códigos da alínea 
+        # anterior em códigos de Huffman do "alfabeto de comprimentos de 
+        # códigos"; 
+        huffman_tree_clens = self.huffmanFromLens(clen_code_lens, 7, False, self.tableCache)
+
+        # ex 4 --- Crie um método que leia e armazene num array os HLIT + 257 comprimentos dos códigos referentes ao alfabeto de literais/comprimentos,
+        # codificados segundo o código de Huffman de comprimentos de códigos: 
+
+        # ex 5 --- Crie um método que leia e armazene num array os HDIST + 1 
+        # comprimentos de código referentes ao alfabeto de distâncias, 
+        # codificados segundo o código de Huffman de comprimentos de códigos 
+
+        # Lidos numa só sequência: uma repetição pode passar dos comprimentos de
+        # literais/comprimentos para os das distâncias (RFC 1951, 3.2.7)
+        code_lens = self.treeCodeLens(hlit + 257 + hdist + 1, huffman_tree_clens)
+        litlen_code_lens = code_lens[:hlit + 257]
+        dist_code_lens = code_lens[hlit + 257:]
+        if litlen_code_lens[256] == 0:
+            raise CodeSetError("Missing end-of-block code")
+
+        if self.events is not None:
+            self.events.dynamicTrees(self, hlit, hdist, hlen, clen_code_lens, litlen_code_lens, dist_code_lens)
+
+        # ex 6 --- Usando o método do ponto 3), determine os códigos de Huffman 
+        # referentes aos dois alfabetos (literais / comprimentos e distâncias) e 
+        # armazene-os num array (ver Doc5).
+
+        huffman_tree_litlen = self.huffmanFromLens(litlen_code_lens, 9, False, self.tableCache)
+        huffman_tree_dist = self.huffmanFromLens(dist_code_lens, 6, False, self.tableCache)
+
+        return huffman_tree_litlen, huffman_tree_dist
+
+    def copyStored(self, out):
+        ''' copies a stored block (BTYPE=0) to out. Returns 0 if no error, -1 otherwise '''
+
+        length = self._storedLength()
+        if length < 0:
+            return -1
+
+        out.write(self.reader.readBytes(length))
+        return 0
 
-        # MAIN LOOP - decode block by block
-        f = open(self.gzh.fName, 'wb')
-        out = []
+    def _storedLength(self):
+        ''' reads LEN and NLEN of a stored block. Returns LEN, or -1 if NLEN does not match it '''
+
+        # LEN and NLEN start at the next byte boundary
+        header = self.reader.readBytes(4)
+        length = header[0] | (header[1] << 8)
+        nlength = header[2] | (header[3] << 8)
+        if length != nlength ^ 0xFFFF:
+            return -1
+        return length
+
+    def inflateBlocks(self, out):
+        ''' generator: decodes the deflate blocks at the current position into out (SlidingWindow),
+            block by block, yielding after each one (pure-Python backend, see inflate.py).
+            Raises GZIPError (errors.py) on invalid blocks '''
+
+        index = self.index
+        events = self.events
+        stats = None
+        numBlocks = 0
 
         BFINAL = 0
         while not BFINAL == 1:
 
+            # random access index: checkpoint at the start of the block
+            if index is not None and self.outTotal + out.total >= index.nextCheckpoint():
+                index.add(self.outTotal + out.total, self.reader.tell(), out.history())
+
+            self.blockNumber = numBlocks + 1
+            if events is not None:
+                stats = self.blockStats = BlockStats(numBlocks + 1, self.reader.tell(), out.total, events.symbols)
+
             BFINAL = self.readBits(1)
             BTYPE = self.readBits(2)
-            if BTYPE != 2:
-                print('Error: Block %d not coded with Huffman Dynamic coding' % (numBlocks + 1))
-                return
-
-            # --- STUDENTS --- ADD CODE HERE
-
-            # ex 1 --- Crie um método que leia o formato do bloco (i.e., devolva o valor 
-            # correspondente a HLIT, HDIST e HCLEN), de acordo com a estrutura de 
-            print("-----------  EX 1  -----------")
-            hlit, hdist, hlen = self.ex1()
-            print(f"HLIT: {hlit}, HDIST: {hdist}, HCLEN: {hlen}")
-
-            # ex 2 --- Crie um método que armazene num array os comprimentos dos códigos 
-            # do “alfabeto de comprimentos de códigos”, com base em HCLEN: 
-            print("-----------  EX 2  -----------")
-            clen_code_lens = self.ex2(hlen)
-            print(clen_code_lens)
-
-            # ex 3 --- Crie um método que converta os comprimentos dos códigos da alínea 
-            # anterior em códigos de Huffman do "alfabeto de comprimentos de 
-            # códigos"; 
-            print("-----------  EX 3  -----------")
-            huffman_tree_clens = self.huffmanFromLens(clen_code_lens)          
-
-            byte_array = [''] *64
-            traverse(byte_array, huffman_tree_clens.root, "")
-            print(byte_array)
-
-            # ex 4 --- Crie um método que leia e armazene num array os HLIT + 257 comprimentos dos códigos referentes ao alfabeto de literais/comprimentos,
-            # codificados segundo o código de Huffman de comprimentos de códigos: 
-            litlen_code_lens = self.treeCodeLens(hlit + 257, huffman_tree_clens)        
-            print("-----------  EX 4  -----------")
-
-            dict_hdist = {}
-            for numero in litlen_code_lens:
-                if numero in dict_hdist:
-                    dict_hdist[numero] += 1
-                else:
-                    dict_hdist[numero] = 1
 
-            print(dict_hdist)
+            if events is not None:
+                stats.btype = BTYPE
+                stats.mark('header')
+                events.blockStart(self, stats)
 
-            # ex 5 --- Crie um método que leia e armazene num array os HDIST + 1 
-            # comprimentos de código referentes ao alfabeto de distâncias, 
-            # codificados segundo o código de Huffman de comprimentos de códigos 
+            if BTYPE == 0:  # stored: bytes copied as they are
+                if self.copyStored(out) != 0:
+                    raise BlockError('Error: Block %d stored with invalid LEN/NLEN' % (numBlocks + 1))
 
-            print("-----------  EX 5  -----------")
-            dist_code_lens = self.treeCodeLens(hdist + 1, huffman_tree_clens)
-            print(dist_code_lens)
+            elif BTYPE == 1:  # fixed Huffman codes
+                out = self.decompress_LZ77(FIXED_TREE_LITLEN, FIXED_TREE_DIST, out)
 
-            # ex 6 --- Usando o método do ponto 3), determine os códigos de Huffman 
-            # referentes aos dois alfabetos (literais / comprimentos e distâncias) e 
-            # armazene-os num array (ver Doc5).
+            elif BTYPE == 2:  # dynamic Huffman codes
+                huffman_tree_litlen, huffman_tree_dist = self.readDynamicTrees()
+                if events is not None:
+                    stats.mark('tables')
 
-            huffman_tree_litlen = self.huffmanFromLens(litlen_code_lens)
-            huffman_tree_dist = self.huffmanFromLens(dist_code_lens)
+                # ex 7 --- Crie as funções necessárias à descompactação dos dados comprimidos, 
+                # com base nos códigos de Huffman e no algoritmo LZ77
+                out = self.decompress_LZ77(huffman_tree_litlen, huffman_tree_dist, out)
 
-            # ex 7 --- Crie as funções necessárias à descompactação dos dados comprimidos, 
-            # com base nos códigos de Huffman e no algoritmo LZ77
-            out = self.decompress_LZ77(huffman_tree_litlen, huffman_tree_dist, out)
+            else:
+                raise BlockError('Error: Block %d with reserved block type (BTYPE=3)' % (numBlocks + 1))
 
-            # ex 8 --- Grave os dados descompactados num ficheiro com o nome original 
-            # (consulte a estrutura gzipHeader, nomeadamente o campo fName e 
-            # analize a função getHeader do ficheiro gzip.cpp). 
+            numBlocks += 1
+            self.numBlocks = numBlocks
+
+            if events is not None:
+                stats.mark('stored' if BTYPE == 0 else 'lz77')
+                stats.endBit = self.reader.tell()
+                stats.outBytes = out.total + out.pos - out.start - stats.outStart
+                events.blockEnd(self, stats)
+                self.blockStats = None
+            yield
+
+        self.blockNumber = 0
+
+    def blocks(self, history=b'', verify=None):
+        ''' generator: decodes the deflate blocks that follow the GZIP header and yields
+            the decompressed bytes of each block, as it is decoded. Raises GZIPError (errors.py) on invalid blocks.
+            history: data already decoded before the current position (resuming from a checkpoint) '''
+
+        chunks = []
+        out = self.output
+        if out is None:
+            out = SlidingWindow(chunks.append)
+            out.preset(history)
+        else:
+            out.origin = out.pos  # shared by every member: matches cannot reach the member before
+        verify = self.verify if verify is None else verify
+        out.crc = 0 if verify else None  # computed by the window, on each flush
+        before = out.total
+
+        # events, index checkpoints and resuming at a bit offset need the block decoder
+        backend = self.backend
+        if not backend.blockLevel and (self.events is not None or self.index is not None or history or self.reader.tell() & 7):
+            backend = PYTHON_BACKEND
+        self.numBlocks = 0
+
+        for _ in backend.inflate(self, out):
+            # entrega o que foi descomprimido (a janela só guarda o histórico)
+            out.flush()
+            yield from chunks
+            chunks.clear()
+
+        self.readTrailer(out.total - before, out.crc)
+
+    def readTrailer(self, size, crc=None):
+        ''' reads the trailer of a member: CRC32 and ISIZE (size modulo 2^32) of the original data.
+            size and crc are those of the data decoded; unless crc is None they are checked
+            against the trailer (ChecksumError on mismatch) '''
+
+        self.CRC32, self.ISIZE = TRAILER.unpack(self.reader.readBytes(8))
+        self.memberSize = size
+        self.outTotal += size
+        if crc is not None:
+            if crc != self.CRC32:
+                raise ChecksumError('Error: CRC32 mismatch (expected %08x, got %08x)' % (self.CRC32, crc))
+            if size & 0xFFFFFFFF != self.ISIZE:
+                raise ChecksumError('Error: ISIZE mismatch (expected %d, got %d)' % (self.ISIZE, size & 0xFFFFFFFF))
+
+    def memberChunks(self):
+        ''' generator: decodes the member whose header was just read (blocks and trailer),
+            yielding its data, and adds its entry to the member index (self.members) '''
+
+        member = GZIPMember(self.memberStart, self.gzh)
+        if self.events is not None:
+            self.events.memberStart(self)
+        yield from self.blocks()
+
+        member.compressedSize = (self.reader.tell() >> 3) - member.offset
+        member.size = self.memberSize
+        member.CRC32 = self.CRC32
+        member.ISIZE = self.ISIZE
+        member.numBlocks = self.numBlocks
+        self.members.append(member)
+        if self.events is not None:
+            self.events.memberEnd(self, member)
+
+    def nextMembers(self):
+        ''' generator: decodes the members that follow the current one (concatenated gzip files) '''
+
+        while not self.reader.eof():
+            error = self.getHeader()
+            if error != 0:
+                raise HeaderError('Formato invalido!')
+            yield from self.memberChunks()
+
+    def decompressChunks(self):
+        ''' generator: decodes every member of the gzip stream and yields the decompressed
+            data chunk by chunk, without writing anything to disk. Raises GZIPError (errors.py) on invalid input.
+            When it ends, self.members holds the member index '''
+
+        self.members = []
+        self.outTotal = 0
+        error = self.getHeader()
+        if error != 0:
+            raise HeaderError('Formato invalido!')
+
+        yield from self.memberChunks()
+        yield from self.nextMembers()
+        if self.events is not None:
+            self.events.streamEnd(self)
+
+    def buildIndex(self, span=1 << 20):
+        ''' decodes the whole stream once, discarding the output, and returns a GZIPIndex
+            with a checkpoint about every span bytes of decompressed data '''
+
+        self.index = GZIPIndex(span)
+        try:
+            for chunk in self.decompressChunks():
+                pass
+            self.index.size = self.outTotal
+            return self.index
+        finally:
+            self.index = None
+
+    def listMembers(self, walk=False):
+        ''' lists the members: offset, header, sizes, CRC32 and ISIZE, without inflating. As gzip -l,
+            only the header of the first member and the trailer at the end of the file are read:
+            right for a single member, the usual gzip file. With walk=True, or an input that is not
+            seekable, every member is found by inflating the stream with the backend (the compiled
+            one by default) and discarding the output: each member ends where the inflater leaves
+            unused data. Blocks are not reported (see scan).
+            Returns the member index (self.members); raises GZIPError on invalid input '''
+
+        if walk or self.fileSize < 0:
+            for chunk in self.decompressChunks():
+                pass
+            return self.members
+
+        self.members = []
+        if self.getHeader() != 0:
+            raise HeaderError('Formato invalido!')
+        member = GZIPMember(self.memberStart, self.gzh)
+        if self.fileSize < (self.reader.tell() >> 3) + TRAILER.size:
+            raise TruncatedError()
 
-            if(len(out) > 32768):
-                # Write every charater that exceeds the 327680 range to the file
-                f.write(bytes(out[0 : len(out) - 32768]))
-                # Keep the rest in the out array
-                out = out[len(out) - 32768 :]
+        fp = self.f.tell()
+        self.f.seek(self.fileStart + self.fileSize - TRAILER.size)
+        member.CRC32, member.ISIZE = TRAILER.unpack(self.f.read(TRAILER.size))
+        self.f.seek(fp)
 
-            # if(len(out) > 32768):
-            #     string += str(out[0 : len(out) - 32768])
-            #     out = out[len(out) - 32768 :]
-            # else:
-            #     print(out)
-            #     string += ''.join(chr(num) for num in out)
+        member.compressedSize = self.fileSize - member.offset
+        member.size = member.ISIZE
+        self.members.append(member)
+        return self.members
 
+    def scanBlocks(self):
+        ''' inspection mode: runs through the deflate blocks of the member whose header was just
+            read without inflating them (see scan). Returns the BlockStats of every block (type,
+            position and size in bits, decompressed bytes; no phases) '''
 
+        blocks = []
+        outBytes = 0
+        BFINAL = 0
+        while not BFINAL == 1:
+            stats = BlockStats(len(blocks) + 1, self.reader.tell(), outBytes)
+            BFINAL = self.readBits(1)
+            BTYPE = self.readBits(2)
+            stats.btype = BTYPE
+
+            if BTYPE == 0:  # stored: skipped by its length
+                length = self._storedLength()
+                if length < 0:
+                    raise BlockError('Error: Block %d stored with invalid LEN/NLEN' % stats.number)
+                self.reader.skipBytes(length)
+                stats.outBytes = length
+            elif BTYPE == 1:
+                stats.outBytes = self._scan_LZ77(FIXED_TREE_LITLEN, FIXED_TREE_DIST)
+            elif BTYPE == 2:
+                stats.outBytes = self._scan_LZ77(*self.readDynamicTrees())
+            else:
+                raise BlockError('Error: Block %d with reserved block type (BTYPE=3)' % stats.number)
+
+            stats.endBit = self.reader.tell()
+            outBytes += stats.outBytes
+            blocks.append(stats)
+
+        self.numBlocks = len(blocks)
+        return blocks
+
+    def scan(self):
+        ''' inspection mode: lists every member and the layout of its blocks without inflating.
+            Headers and trailers are read as usual, stored blocks are skipped by their length and
+            Huffman blocks are decoded without output (no window, copies or CRC32). Every symbol is
+            still decoded in Python: this is hardly faster than the pure-Python decoder and much
+            slower than a compiled backend, so it is for the block layout, not a quick listing
+            (see listMembers). Nothing is checked but the structure of the stream.
+            Returns a report (dict) of the stream and its members, and leaves the member index
+            in self.members, each with the BlockStats of its blocks in member.blocks.
+            Raises GZIPError on invalid input '''
+
+        self.members = []
+        self.outTotal = 0
+        report = {'file': os.fspath(self.gzFile), 'compressedSize': self.fileSize,
+                  'origFileSize': self.getOrigFileSize(), 'members': []}
+
+        while not self.members or not self.reader.eof():
+            if self.getHeader() != 0:
+                raise HeaderError('Formato invalido!')
+            member = GZIPMember(self.memberStart, self.gzh)
+            member.blocks = self.scanBlocks()
+            self.readTrailer(sum(b.outBytes for b in member.blocks))
+
+            member.compressedSize = (self.reader.tell() >> 3) - member.offset
+            member.size = self.memberSize
+            member.CRC32 = self.CRC32
+            member.ISIZE = self.ISIZE
+            member.numBlocks = self.numBlocks
+            self.members.append(member)
+
+            blockTypes = dict.fromkeys(BTYPE_NAMES, 0)
+            for b in member.blocks:
+                blockTypes[BTYPE_NAMES[b.btype]] += 1
+            report['members'].append({
+                'offset': member.offset, 'name': member.header.fName, 'comment': member.header.fComment,
+                'mtime': member.header.mTime, 'os': member.header.OS,
+                'compressedSize': member.compressedSize, 'size': member.size,
+                'CRC32': member.CRC32, 'ISIZE': member.ISIZE, 'blockTypes': blockTypes,
+                'blocks': [{'type': BTYPE_NAMES[b.btype], 'startBit': b.startBit, 'bits': b.bits,
+                            'size': b.outBytes} for b in member.blocks]})
+
+        report['size'] = self.outTotal
+        return report
+
+    def resumeChunks(self, checkpoint):
+        ''' generator: resumes inflation at a checkpoint of a GZIPIndex (needs a seekable input)
+            and yields the decompressed data from checkpoint.out to the end of the stream '''
+
+        self.reader = self._readerAt(checkpoint.bit >> 3)
+        self.reader.consume(checkpoint.bit & 7)
+        self.members = []
+        self.outTotal = checkpoint.out
+
+        # the CRC32 of the first member cannot be checked: its beginning is not decoded
+        yield from self.blocks(checkpoint.window, verify=False)
+        yield from self.nextMembers()
+
+    def pread(self, offset, length, index):
+        ''' returns length bytes of decompressed data starting at offset, inflating only
+            from the nearest checkpoint of index '''
+
+        checkpoint = index.find(offset)
+        return self.readFrom(checkpoint, offset - checkpoint.out, length)
+
+    def readFrom(self, checkpoint, skip, length):
+        ''' returns length bytes of decompressed data starting skip bytes after a checkpoint '''
+
+        data = bytearray()
+        if length <= 0:
+            return bytes(data)
+
+        for chunk in self.resumeChunks(checkpoint):
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            data += chunk[skip:skip + length - len(data)]
+            skip = 0
+            if len(data) >= length:
+                break
+        return bytes(data)
 
-            numBlocks += 1
+    def decompressMember(self, member):
+        ''' generator: jumps straight to a member of an index built before (needs a seekable input)
+            and yields its decompressed data '''
+
+        self.reader = self._readerAt(member.offset)
+
+        error = self.getHeader()
+        if error != 0:
+            raise HeaderError('Formato invalido!')
+        yield from self.blocks()
+
+    def decompressInto(self, buffer=None):
+        ''' decodes every member straight into buffer (bytearray, memoryview or any writable buffer),
+            with no intermediate copies, and returns the data: buffer itself if filled to the end,
+            a memoryview of the bytes written otherwise. Raises ValueError if it is too small.
+            Without buffer, a bytearray of expectedSize() bytes is allocated: exactly one allocation
+            when ISIZE is right (one member under 4 GiB), grown in place in chunks otherwise '''
+
+        if buffer is None:
+            out = BufferWindow(bytearray(max(self.expectedSize(), 0)), grow=True)
+        else:
+            out = BufferWindow(buffer)
+        self.output = out
+        try:
+            for chunk in self.decompressChunks():
+                pass
+        finally:
+            self.output = None
+        return out.data()
+
+    def salvage(self):
+        ''' decodes as much of the stream as it can (damaged or truncated files): instead of raising
+            GZIPError, returns (data, diagnostic), with every byte decoded before the error (those of
+            the members before it too) and None, or a dict telling what went wrong and where:
+            error (class of the GZIPError, see errors.py), message, member and block (numbered
+            from 1; block None outside the blocks), bit (position in the compressed stream) and
+            outBytes (bytes recovered). Uses the pure-Python decoder, which stops after the
+            last whole symbol '''
+
+        self.backend = PYTHON_BACKEND
+        out = BufferWindow(bytearray(max(self.expectedSize(), 0)), grow=True)
+        self.output = out
+        diagnostic = None
+        try:
+            for chunk in self.decompressChunks():
+                pass
+        except GZIPError as e:
+            diagnostic = {'error': type(e).__name__, 'message': str(e), 'member': len(self.members) + 1,
+                          'block': self.blockNumber or None,
+                          'bit': self.reader.tell(), 'outBytes': out.pos}
+        finally:
+            self.output = None
+        return out.data(), diagnostic
+
+    def decompressTo(self, target):
+        ''' decodes every member and writes the data to target (file descriptor or binary file object)
+            straight from the window, with no intermediate copies. Returns the number of bytes written '''
+
+        if hasattr(target, 'write'):
+            write = target.write
+        else:
+            def write(data):
+                while data:
+                    data = data[os.write(target, data):]
+
+        self.output = SlidingWindow(write, views=True)
+        try:
+            for chunk in self.decompressChunks():
+                pass
+        finally:
+            self.output = None
+        return self.outTotal
 
-        # Escrever os bytes restantes
-        f.write(bytes(out))
+    def decompress(self):
+        ''' main function for decompressing the gzip file with deflate algorithm. Returns the member
+            index; raises GZIPError (errors.py) on invalid input, after closing the files '''
 
-        # Fechar o ficheiro descompactado
-        f.close
+        # read GZIP header (original file size and file name are shown by the events, when verbose)
+        error = self.getHeader()
+        if error != 0:
+            self.close()
+            raise HeaderError('Formato invalido!')
 
-        # Fechar o ficheiro lido 
-        self.f.close()
-        print("End: %d block(s) analyzed." % numBlocks)
+        # MAIN LOOP - decode block by block
+        # ex 8 --- Grave os dados descompactados num ficheiro com o nome original 
+        # (consulte a estrutura gzipHeader, nomeadamente o campo fName e 
+        # analize a função getHeader do ficheiro gzip.cpp). 
+        # sem nome no cabeçalho: nome do ficheiro comprimido sem a extensão
+        f = open(self.gzh.fName or outputName(self.gzFile or 'stdin.gz'), 'wb')
+        self.members = []
+        self.output = SlidingWindow(f.write, views=True)  # escreve diretamente da janela
+        try:
+            for chunk in self.memberChunks():
+                pass
+
+            # ficheiros concatenados: os membros seguintes vão para o mesmo ficheiro
+            for chunk in self.nextMembers():
+                pass
+        finally:
+            self.output = None
+
+            # Fechar o ficheiro descompactado
+            f.close()
+
+            # Fechar o ficheiro lido 
+            self.close()
+
+        if self.events is not None:
+            self.events.streamEnd(self)
+        return self.members
+
+    def close(self):
+        ''' closes the compressed file, if it was opened by this object, and its memory map '''
+        if self.map is not None:
+            self.reader = BitReader(b'')
+            self.view.release()
+            try:
+                self.map.close()
+            except BufferError:  # views of it still in use: unmapped when they are freed
+                pass
+            self.map = self.view = None
+        if self.ownsFile:
+            self.f.close()
 
     def getOrigFileSize(self):
-        ''' reads file size of original file (before compression) - ISIZE '''
+        ''' reads file size of original file (before compression) - ISIZE. Returns -1 if the input is not seekable '''
+
+        if self.fileSize < 4:
+            return -1
 
         # saves current position of file pointer
         fp = self.f.tell()
 
         # jumps to end-4 position
-        self.f.seek(self.fileSize - 4)
+        self.f.seek(self.fileStart + self.fileSize - 4)
 
         # reads the last 4 bytes (LITTLE ENDIAN)
-        sz = 0
-        for i in range(4):
-            byte = self.f.read(1)[0]
-            sz += byte << (8 * i)
+        sz = int.from_bytes(self.f.read(4), 'little')
 
         # restores file pointer to its original position
         self.f.seek(fp)
 
         return sz
 
+    def getHeaderSize(self):
+        ''' size in bytes of the header of the first member (10 if it cannot be read) '''
+
+        if self.fileSize < 10:
+            return 10
+        fp = self.f.tell()
+        self.f.seek(self.fileStart)
+        data = self.f.read(min(self.fileSize, GZIPHeader.READ_SIZE))
+        self.f.seek(fp)
+        try:
+            end = GZIPHeader().parse(data)
+        except EOFError:  # longer than READ_SIZE (long FEXTRA or names): the fixed part only
+            end = 10
+        return max(end, 10)
+
+    def expectedSize(self):
+        ''' estimate of the decompressed size, for preallocating the output in memory: ISIZE
+            (getOrigFileSize), unless deflate could not compress that much (more than MAX_RATIO:1):
+            then it is the last of several members, or wrong, and the size is guessed from the
+            compressed size. There is no lower bound (stored blocks can be as small as the
+            compressor likes), except that ISIZE is the size modulo 2^32: when the deflate data
+            alone reaches 4 GiB, an ISIZE below half of it is taken as wrapped around and raised
+            by multiples of 2^32. Returns -1 if the input is not seekable '''
+
+        if self.fileSize < 0:
+            return -1
+        isize = self.getOrigFileSize()
+        high = MAX_RATIO * self.fileSize
+
+        deflateSize = self.fileSize - self.getHeaderSize() - TRAILER.size
+        if 0 <= isize < deflateSize >> 1 and deflateSize >= 1 << 32:
+            isize += ((deflateSize >> 1) - isize + 0xFFFFFFFF) >> 32 << 32
+        if 0 <= isize <= high:
+            return isize
+        return min(high, GUESS_RATIO * self.fileSize)
+
     def getHeader(self):
         ''' reads GZIP header'''
 
+        self.memberStart = self.reader.tell() >> 3
         self.gzh = GZIPHeader()
-        header_error = self.gzh.read(self.f)
-        return header_error
-
-    def readBits(self, n, keep=False):
-        while self.available_bits < n:
-            # byte = self.f.read(1)
-            # if not byte:
-            #     raise EOFError("Fim inesperado do ficheiro.")
-            self.bits_buffer = self.f.read(1)[0] << self.available_bits | self.bits_buffer
-            self.available_bits += 8
+        header_error = self.gzh.read(self.reader)
 
-        mask = (2 ** n) - 1
-        value = self.bits_buffer & mask
+        # FLG_FHCRC: header CRC16
+        if header_error == 0 and self.verify and self.gzh.FLG_FHCRC == 1:
+            if int.from_bytes(self.gzh.HCRC, 'little') != self.gzh.headerCRC:
+                header_error = -1
 
-        if not keep:
-            self.bits_buffer >>= n
-            self.available_bits -= n
+        return header_error
 
-        return value
+    def readBits(self, n, keep=False):
+        ''' reads n bits from the compressed stream (see BitReader.readBits) '''
+        return self.reader.readBits(n, keep)
+
+
+class GZIPReader(io.RawIOBase):
+    ''' read-only file-like object over a gzip stream: data is inflated lazily,
+        block by block, as the consumer reads it (wrap in io.BufferedReader for readline, etc.) '''
+
+    def __init__(self, source, verify=True, index=None):
+        ''' index: GZIPIndex of the file; if given, the reader is seekable '''
+        self.gz = GZIP(source, verbose=False, verify=verify)
+        self.index = index
+        self.chunks = self.gz.decompressChunks()
+        self.pending = memoryview(b'')
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self.index is not None
+
+    def readinto(self, b):
+        while not self.pending:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return 0
+            self.pending = memoryview(chunk)
+
+        n = min(len(b), len(self.pending))
+        b[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        self.position += n
+        return n
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        ''' moves to a decompressed offset, resuming inflation from the nearest checkpoint '''
+        if self.index is None:
+            raise io.UnsupportedOperation('seek needs a GZIPIndex')
+
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.index.size
+        offset = max(0, min(offset, self.index.size))
+
+        checkpoint = self.index.find(offset)
+        self.chunks = self.gz.resumeChunks(checkpoint)
+        self.pending = memoryview(b'')
+        self.position = checkpoint.out
+
+        skip = offset - checkpoint.out  # discards the data between the checkpoint and offset
+        while skip > 0:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            if len(chunk) > skip:
+                self.pending = memoryview(chunk)[skip:]
+                self.position += skip
+                break
+            skip -= len(chunk)
+            self.position += len(chunk)
+        return self.position
+
+    def close(self):
+        if not self.closed:
+            self.gz.close()
+        super().close()
+
+
+def outputName(path):
+    ''' name of the decompressed file, from the name of the compressed one (as gunzip) '''
+    name = os.path.basename(path)
+    lower = name.lower()
+    if lower.endswith('.tgz'):
+        return name[:-4] + '.tar'
+    for suffix in ('.gz', '-gz', '.z'):
+        if lower.endswith(suffix) and len(name) > len(suffix):
+            return name[:-len(suffix)]
+    return name + '.out'
+
+
+def _decompressMember(args):
+    ''' worker of decompressMembersParallel: decodes one member of a file '''
+    source, member, verify = args
+    gz = GZIP(source, verbose=False, verify=verify)
+    try:
+        return b''.join(gz.decompressMember(member))
+    finally:
+        gz.close()
+
+
+def decompressMembersParallel(filename, members, workers=None, verify=True):
+    ''' generator: decodes the members of an index (GZIP.members) in parallel, one process per
+        member at a time, and yields the decompressed data of each member in order '''
+    with ProcessPoolExecutor(workers) as executor:
+        yield from executor.map(_decompressMember, [(filename, m, verify) for m in members])
+
+
+def _decompressRange(args):
+    ''' worker of decompressParallel: decodes the data between two checkpoints '''
+    source, checkpoint, length = args
+    gz = GZIP(source, verbose=False)
+    try:
+        return gz.readFrom(checkpoint, 0, length)
+    finally:
+        gz.close()
+
+
+def decompressParallel(filename, index, workers=None):
+    ''' generator: decodes a file in parallel using the checkpoints of a GZIPIndex built before
+        (GZIP.buildIndex): each process inflates from one checkpoint up to the next one.
+        Yields the decompressed data in order, byte-identical to the serial decoder.
+        The CRC32 of the members is not checked (it was when the index was built).
+        Ranges after the first resume with a window of history, so they use the pure-Python decoder:
+        this is faster than that decoder alone, never than the serial compiled backend (zlib, isal) '''
+    ranges = []
+    for i, checkpoint in enumerate(index.checkpoints):
+        end = index.checkpoints[i + 1].out if i + 1 < len(index.checkpoints) else index.size
+        ranges.append((filename, checkpoint, end - checkpoint.out))
+
+    with ProcessPoolExecutor(workers) as executor:
+        yield from executor.map(_decompressRange, ranges)
+
+
+TRAILER = struct.Struct('<II')  # CRC32 ISIZE
+MAX_RATIO = 1032  # largest deflate compression ratio (258 bytes in a match of 2 bits, at best)
+GUESS_RATIO = 3  # compression ratio assumed when ISIZE cannot be used (typical of text)
+UINT64 = struct.Struct('<Q')  # 8 input bytes at once, for the accumulator of _inflate_fast
+
+# Length and distance codes (RFC 1951 3.2.5): base value and number of extra bits of each code
+LENGTH_BASE = [3, 4, 5, 6, 7, 8, 9, 10, 11, 13, 15, 17, 19, 23, 27, 31, 35, 43, 51, 59, 67, 83, 99, 115, 131, 163, 195, 227, 258]
+LENGTH_EXTRA = [0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2, 3, 3, 3, 3, 4, 4, 4, 4, 5, 5, 5, 5, 0]
+DIST_BASE = [1, 2, 3, 4, 5, 7, 9, 13, 17, 25, 33, 49, 65, 97, 129, 193, 257, 385, 513, 769, 1025, 1537, 2049, 3073,
+             4097, 6145, 8193, 12289, 16385, 24577]
+DIST_EXTRA = [0, 0, 0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6, 7, 7, 8, 8, 9, 9, 10, 10, 11, 11, 12, 12, 13, 13]
+
+# names of the block types (BTYPE 0, 1 and 2), in the scan report
+BTYPE_NAMES = ['stored', 'fixed', 'dynamic']
+
+# order in which the code length code lengths are stored (HCLEN + 4 of them)
+CLEN_ORDER = [16, 17, 18, 0, 8, 7, 9, 6, 10, 5, 11, 4, 12, 3, 13, 2, 14, 1, 15]
+
+# Fixed Huffman codes (BTYPE=1, RFC 1951 3.2.6): built once at import and shared by every block and file
+FIXED_LITLEN_LENS = [8] * 144 + [9] * 112 + [7] * 24 + [8] * 8
+FIXED_DIST_LENS = [5] * 32  # codes 30 and 31 never occur, but take part in the code construction
+FIXED_TREE_LITLEN = GZIP.huffmanFromLens(FIXED_LITLEN_LENS, 9)
+FIXED_TREE_DIST = GZIP.huffmanFromLens(FIXED_DIST_LENS, 6)
+FIXED_TREE_LITLEN.table.restrict(286)
+FIXED_TREE_DIST.table.restrict(30)
 
 
 if __name__ == '__main__':
 
+    # usage: gzip.py [--profile | --list | --members | --stats | --salvage] [file]
+    # --profile: no block details, cProfile and tracemalloc report on stderr
+    # --list: sizes and CRC32 from the first header and the last trailer, as gzip -l (see GZIP.listMembers)
+    # --members: the same for every member of a multi-member file, inflated by the compiled backend
+    # --stats: the layout of every block, found without inflating (see GZIP.scan), as JSON
+    # --salvage: writes what can be decoded of a damaged file, and where it is damaged (see GZIP.salvage)
+    args = sys.argv[1:]
+    mode = args.pop(0) if args and args[0] in ('--profile', '--list', '--members', '--stats', '--salvage') else None
+
     # gets filename from command line if provided
     fileName = "FAQ.txt.gz"
-    if len(sys.argv) > 1:
-        fileName = sys.argv[1]
-
-    # decompress file
-    gz = GZIP(fileName)
-    gz.decompress()
+    if args:
+        fileName = args[0]
+
+    if mode in ('--list', '--members', '--stats'):
+        gz = GZIP(fileName)
+        try:
+            if mode == '--stats':
+                report = gz.scan()
+            else:
+                members = gz.listMembers(walk=mode == '--members')
+        except GZIPError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        finally:
+            gz.close()
+
+        if mode == '--stats':
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            print("%10s %12s %6s  %-8s  %s" % ('compressed', 'uncompressed', 'ratio', 'crc', 'name'))
+            for m in members:
+                ratio = 1 - m.compressedSize / m.size if m.size else 0.0
+                print("%10d %12d %5.1f%%  %08x  %s" % (m.compressedSize, m.size, 100 * ratio, m.CRC32,
+                                                      m.header.fName or '-'))
+        sys.exit(0)
+
+    if mode == '--salvage':
+        gz = GZIP(fileName, verbose=False)
+        try:
+            data, diagnostic = gz.salvage()
+        finally:
+            gz.close()
+        outName = outputName(fileName)
+        with open(outName, 'wb') as f:
+            f.write(data)
+        print("%s: %d bytes recovered" % (outName, len(data)))
+        if diagnostic is not None:
+            json.dump(diagnostic, sys.stdout, indent=2)
+            print()
+        sys.exit(0 if diagnostic is None else 1)
+
+    # decompress file (exit status 1 if it fails; batch.py decompresses many files)
+    gz = GZIP(fileName, verbose=mode is None)
+    try:
+        if mode == '--profile':
+            with Profiler():
+                gz.decompress()
+        else:
+            gz.decompress()
+    except GZIPError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,186 @@
+# Teoria da Informacao, LEI, 2022
+# Push-based (incremental) GZIP decompressor, and its asyncio adapter
+
+import asyncio
+
+from bitreader import BitReader
+from errors import BlockError, HeaderError, TruncatedError
+from gzip import GZIP, GZIPMember, FIXED_TREE_LITLEN, FIXED_TREE_DIST
+from inflate import ZlibBackend
+from window import SlidingWindow
+
+
+class GZIPDecompressor:
+    ''' push-based gzip decompressor: feed(data) takes the compressed stream in pieces of any size,
+        as they arrive, and returns the data decoded so far; flush() ends the stream.
+        Decoding stops wherever a piece ends (inside a header, a block header or a Huffman code)
+        and goes on with the next one: a step that runs out of input is read again from its start.
+        Every member of a multi-member stream is decoded, and the trailer of each member is only
+        needed at its end. backend: as in GZIP ('python', 'zlib', 'isal'; None for the fastest) '''
+
+    def __init__(self, verify=True, backend=None):
+        self.gz = GZIP(b'', verbose=False, verify=verify, backend=backend)
+        self.reader = self.gz.reader = BitReader(b'')
+        self.verify = verify
+        self.chunks = []
+        self.out = None  # window of the member being decoded
+        self.member = None
+        self.state = 'header'  # header, block, data, compiled or trailer
+        self.final = 0  # BFINAL of the current block
+        self.trees = None  # literal/length and distance trees of the current block
+        self.inflater = None  # decompressobj of a compiled backend
+        self.tail = b''  # input the compiled inflater left for later (output limit reached)
+
+    @property
+    def members(self):
+        ''' members decoded so far (GZIPMember) '''
+        return self.gz.members
+
+    @property
+    def eof(self):
+        ''' True between members: every member fed so far is complete '''
+        return self.state == 'header' and bool(self.gz.members)
+
+    def feed(self, data):
+        ''' decodes as much of data (and of what was left from earlier calls) as possible and
+            returns the decompressed bytes, all at once (see feedChunks to get them in pieces).
+            Raises GZIPError (errors.py) on invalid data '''
+        return b''.join(self.feedChunks(data))
+
+    def feedChunks(self, data):
+        ''' generator: as feed, but yields the decompressed bytes in pieces as they are decoded, so
+            that a small piece of highly compressed input never has to be held whole in memory:
+            at most ZlibBackend.OUT_CHUNK bytes at a time with a compiled backend, a block at a
+            time with the pure-Python decoder '''
+        self.reader.feed(data)
+        while True:
+            try:
+                more = self._step()
+            except EOFError:  # input ends inside a step: it starts again with the next data
+                more = False
+            data = self._output()
+            if data:
+                yield data
+            if not more:
+                return
+
+    def flush(self):
+        ''' ends the stream: returns the decompressed bytes still pending.
+            Raises TruncatedError if the stream ends inside a member '''
+        data = self._output()
+        if not self.eof or not self.reader.eof():
+            raise TruncatedError()
+        return data
+
+    def _output(self):
+        if self.out is not None:
+            self.out.flush()
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+    def _step(self):
+        ''' decodes the next part of the stream (header, block header, block data, trailer).
+            Raises EOFError, with the reader back at the start of the part, if the input ends
+            inside it. Returns False when there is nothing more to decode for now '''
+        gz = self.gz
+        reader = self.reader
+        mark = reader.mark()
+        try:
+            if self.state == 'header':
+                if reader.eof():
+                    return False
+                if gz.getHeader() != 0:
+                    raise HeaderError('Formato invalido!')
+                self.member = GZIPMember(gz.memberStart, gz.gzh)
+                self.out = SlidingWindow(self.chunks.append)
+                self.out.crc = 0 if self.verify else None
+                gz.numBlocks = 0
+                if gz.backend.blockLevel:
+                    self.state = 'block'
+                else:
+                    self.inflater = gz.backend.module.decompressobj(-15)
+                    self.state = 'compiled'
+
+            elif self.state == 'block':
+                BFINAL = gz.readBits(1)
+                BTYPE = gz.readBits(2)
+                if BTYPE == 0:  # stored: LEN, NLEN and the data are read at once
+                    if gz.copyStored(self.out) != 0:
+                        raise BlockError('Error: Block %d stored with invalid LEN/NLEN' % (gz.numBlocks + 1))
+                    self._blockEnd(BFINAL)
+                elif BTYPE == 1:
+                    self.trees = FIXED_TREE_LITLEN, FIXED_TREE_DIST
+                    self.state = 'data'
+                elif BTYPE == 2:
+                    self.trees = gz.readDynamicTrees()
+                    self.state = 'data'
+                else:
+                    raise BlockError('Error: Block %d with reserved block type (BTYPE=3)' % (gz.numBlocks + 1))
+                self.final = BFINAL
+
+            elif self.state == 'data':
+                # decompress_LZ77 keeps the symbols decoded and goes back to the start of the last one
+                mark = None
+                gz.decompress_LZ77(self.trees[0], self.trees[1], self.out)
+                self._blockEnd(self.final)
+
+            elif self.state == 'compiled':
+                # bounded output: the input left over is kept in tail, output held back is drained with b''
+                data = self.tail or reader.readChunk()
+                try:
+                    chunk = self.inflater.decompress(data, ZlibBackend.OUT_CHUNK)
+                except gz.backend.module.error as e:
+                    raise gz.backend.error(e)
+                self.tail = self.inflater.unconsumed_tail
+                if not data and not chunk and not self.inflater.eof:
+                    return False
+                self.out.write(chunk)
+                if self.inflater.eof:
+                    reader.unread(len(self.inflater.unused_data))
+                    self.state = 'trailer'
+
+            elif self.state == 'trailer':
+                self.out.flush()
+                gz.readTrailer(self.out.total, self.out.crc)
+                member = self.member
+                member.compressedSize = (reader.tell() >> 3) - member.offset
+                member.size = gz.memberSize
+                member.CRC32 = gz.CRC32
+                member.ISIZE = gz.ISIZE
+                member.numBlocks = gz.numBlocks
+                gz.members.append(member)
+                self.state = 'header'
+
+        except EOFError:
+            if mark is not None:
+                reader.reset(mark)
+            raise
+        return True
+
+    def _blockEnd(self, final):
+        self.gz.numBlocks += 1
+        self.trees = None
+        self.state = 'trailer' if final else 'block'
+
+
+async def decompressStream(stream, chunkSize=1 << 16, verify=True, backend=None, inThread=True):
+    ''' async generator: reads a gzip stream from an asyncio StreamReader (or any object with a
+        coroutine read(n), e.g. an HTTP body) and yields the decompressed data as it arrives,
+        never holding the whole payload. With inThread, each piece is decoded in a worker thread
+        so that the event loop keeps running meanwhile. Raises TruncatedError if the stream is truncated '''
+    d = GZIPDecompressor(verify, backend)
+    while True:
+        chunk = await stream.read(chunkSize)
+        if not chunk:
+            break
+        pieces = d.feedChunks(chunk)  # bounded pieces: a small chunk may decode to a lot of data
+        while True:
+            data = await asyncio.to_thread(next, pieces, None) if inThread else next(pieces, None)
+            if data is None:
+                break
+            yield data
+
+    data = d.flush()
+    if data:
+        yield data
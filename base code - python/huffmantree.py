@@ -2,13 +2,18 @@
 # Adapted from Java's implementation of Rui Pedro Paiva
 # Teoria da Informacao, LEI, 2022
 
+import threading
+from array import array
+from collections import OrderedDict
+from errors import CodeSetError
 
 class HFNode:
 	'''class for representation of a Huffman node '''
 
-	index = -1  # if leaf, saves the position in alphabet; otherwise, -1;
-	level = 0 # level of the node in the tree
-	left, right = None, None  # left and right child nodes. If leaf, both are None
+	# index: if leaf, saves the position in alphabet; otherwise, -1;
+	# level: level of the node in the tree
+	# left, right: left and right child nodes. If leaf, both are None
+	__slots__ = ('index', 'level', 'left', 'right')  # no __dict__ per node
 	
 	
 	def __init__(self, i, lv, l=None, r=None):
@@ -27,6 +32,7 @@ class HuffmanTree:
 	'''class for creating, managing and accessing Huffman trees'''
 	
 	root = curNode = None  
+	table = None  # optional HuffmanTable with the same codes, for fast decoding
 		
 
 	def __init__(self, root=None, curNode=None):
@@ -175,6 +181,44 @@ class HuffmanTree:
 						
 		return pos
 
+
+	def addCode(self, code, length, ind):
+		''' Adds a new node to the tree, like addNode, with the code given as an int of length bits
+			(first bit = most significant). Same return values as addNode '''
+
+		tmp = self.root
+		for lv in range(length):
+			# trying to create son of leaf --> error, not prefix code
+			if tmp.index != -1:
+				return -2
+
+			bit = (code >> (length - 1 - lv)) & 1
+			child = tmp.right if bit else tmp.left
+			if child is None:
+				child = HFNode(ind if lv == length - 1 else -1, lv + 1)
+				if bit:
+					tmp.right = child
+				else:
+					tmp.left = child
+			elif lv == length - 1:  # already inserted
+				return -1
+			tmp = child
+
+		return tmp.index
+
+
+	def findCode(self, code, length, cur=None):
+		''' Finds node from cur node following the length bits of the int code (first bit = most significant).
+			Same return values as findNode '''
+
+		tmp = self.root if cur is None else cur
+		for lv in range(length):
+			tmp = tmp.right if (code >> (length - 1 - lv)) & 1 else tmp.left
+			if tmp is None:
+				return -1
+
+		return -2 if tmp.index == -1 else tmp.index
+
 	
 
 	
@@ -207,3 +251,289 @@ class HuffmanTree:
 		
 		return pos
 
+
+
+class ArrayHuffmanTree:
+	'''Huffman tree with the same interface as HuffmanTree, stored in flat arrays instead of node objects:
+	   node i has children left[i] and right[i] (0 = no child: the root, node 0, is never a child),
+	   alphabet position index[i] (-1 if not leaf) and level[i]'''
+
+	__slots__ = ('left', 'right', 'index', 'level', 'curNode', 'table')
+
+	root = 0
+
+
+	def __init__(self):
+		self.left = array('h', [0])
+		self.right = array('h', [0])
+		self.index = array('h', [-1])
+		self.level = array('b', [0])
+		self.curNode = 0
+		self.table = None
+
+
+	def isLeaf(self, node):
+		return self.left[node] == 0 and self.right[node] == 0
+
+
+	def resetCurNode(self):
+		''' position curNode pointer on the root of the tree '''
+		self.curNode = 0
+
+
+	def addCode(self, code, length, ind):
+		''' Adds a new node to the tree with the code given as an int of length bits. Same return values as addNode '''
+
+		left, right, index = self.left, self.right, self.index
+		tmp = 0
+		for lv in range(length):
+			# trying to create son of leaf --> error, not prefix code
+			if index[tmp] != -1:
+				return -2
+
+			children = right if (code >> (length - 1 - lv)) & 1 else left
+			child = children[tmp]
+			if child == 0:
+				child = len(index)
+				left.append(0)
+				right.append(0)
+				index.append(ind if lv == length - 1 else -1)
+				self.level.append(lv + 1)
+				children[tmp] = child
+			elif lv == length - 1:  # already inserted
+				return -1
+			tmp = child
+
+		return index[tmp]
+
+
+	def addNode(self, s, ind, verbose=False):
+		''' Adds a new node to the tree. Gets the code as a string s of zeros and ones and the index of the alphabet.
+			returns: 
+				 0: success
+				-1: node already exists
+				-2: code is not longer prefix code'''
+
+		pos = self.addCode(int(s, 2) if s else 0, len(s), ind)
+
+		if verbose:
+			if pos == -1:
+				print("Code '" + s + "' already inserted!!!")
+			elif pos == -2:
+				print("Code '" + s + "' trying to extend leaf - no prefix code!!!")
+			else:
+				print("Code '" + s + "' successfully inserted!!!")
+
+		return pos
+
+
+	def findCode(self, code, length, cur=None):
+		''' Finds node from cur node following the length bits of the int code. Same return values as findNode '''
+
+		tmp = 0 if cur is None else cur
+		for lv in range(length):
+			tmp = (self.right if (code >> (length - 1 - lv)) & 1 else self.left)[tmp]
+			if tmp == 0:
+				return -1
+
+		return self.index[tmp] if self.index[tmp] != -1 else -2
+
+
+	def findNode(self, s, cur=None, verbose=False):
+		''' finds node from cur node following a string of '0's and '1's for traversing left or right, respectfully.
+			returns:
+			-1 if not found
+			-2 if it is prefix of an existing code
+			indice of the alphabet if found '''
+
+		pos = self.findCode(int(s, 2) if s else 0, len(s), cur)
+
+		if verbose:
+			if pos == -1:
+				print("Code '" + s + "' not found!!!")
+			elif pos == -2:
+				print("Code '" + s + "': not found but prefix!!!")
+			else:
+				print("Code '" + s + "' found, alphabet position: " + str(pos) )
+
+		return pos
+
+
+	def nextNode(self, dir):
+		''' updates curNode based on the direction dir to descend the tree '''
+
+		cur = self.curNode
+		if self.left[cur] == 0 and self.right[cur] == 0:
+			return -1
+
+		child = self.left[cur] if dir == '0' else self.right[cur]
+		if child == 0:
+			return -1
+
+		self.curNode = child
+		if self.left[child] == 0 and self.right[child] == 0:
+			return self.index[child]
+		return -2
+
+
+class HuffmanTable:
+	'''lookup table for decoding the Huffman codes of a DEFLATE stream (zlib inflate_fast style).
+	   The primary table is indexed by the next rootBits bits of the stream (LSB first); codes longer
+	   than rootBits go through a sub-table linked from the primary entry.
+	   Each entry is an int: bits 0-3 number of bits to consume, bit 4 LINK flag,
+	   remaining bits the alphabet symbol (leaf) or the offset of the sub-table (link).
+	   An entry equal to 0 means invalid code.'''
+
+	LINK = 16
+
+
+	def __init__(self, lenArray, rootBits=9):
+		maxLen = max(lenArray) if lenArray else 0
+		self.rootBits = min(rootBits, maxLen)
+		self.table = [0] * (1 << self.rootBits)
+		self.codes = codes = canonicalCodes(lenArray)
+
+		root = self.rootBits
+		table = self.table
+		longCodes = []
+		for symbol, length in enumerate(lenArray):
+			if length == 0:
+				continue
+			rev = reverseBits(codes[symbol], length)
+
+			if length <= root:
+				# short code: fill every primary entry that starts with it
+				entry = (symbol << 5) | length
+				for i in range(rev, len(table), 1 << length):
+					table[i] = entry
+			else:
+				longCodes.append((rev, length, symbol))
+
+		# sub-tables: one per primary index, big enough for the longest code sharing that prefix
+		mask = (1 << root) - 1
+		subBits = {}
+		for rev, length, symbol in longCodes:
+			low = rev & mask
+			subBits[low] = max(subBits.get(low, 0), length - root)
+
+		for low in sorted(subBits):
+			table[low] = (len(table) << 5) | self.LINK | subBits[low]
+			table.extend([0] * (1 << subBits[low]))
+
+		for rev, length, symbol in longCodes:
+			link = table[rev & mask]
+			offset, sb = link >> 5, link & 15
+			entry = (symbol << 5) | (length - root)
+			for i in range(rev >> root, 1 << sb, 1 << (length - root)):
+				table[offset + i] = entry
+
+		self.pairs = None
+
+
+	def restrict(self, count):
+		''' makes the codes of symbols >= count invalid (entry 0), for code sets built with lengths
+		    for symbols that must never occur (fixed codes: literal/lengths 286, 287, distances 30, 31) '''
+		self.table = [0 if entry & self.LINK == 0 and entry >> 5 >= count else entry for entry in self.table]
+		self.pairs = None
+
+
+	def literalPairs(self):
+		''' table indexed like the primary table: where the rootBits bits hold two whole literal codes
+		    (symbols < 256) the entry is literal1 | literal2 << 8 | total length << 16, otherwise 0.
+		    Lets the decoder emit two short literals with one lookup. Built on first use '''
+		if self.pairs is None:
+			table = self.table
+			root = self.rootBits
+			pairs = [0] * (1 << root)
+			for i in range(1 << root):
+				first = table[i]
+				if first == 0 or first & self.LINK or first >> 5 > 255:
+					continue
+				n = first & 15
+				# the remaining root - n bits are known: the second code must fit in them
+				second = table[i >> n]
+				if second == 0 or second & self.LINK or second >> 5 > 255 or n + (second & 15) > root:
+					continue
+				pairs[i] = (first >> 5) | ((second >> 5) << 8) | ((n + (second & 15)) << 16)
+			self.pairs = pairs
+		return self.pairs
+
+
+class HuffmanTableCache:
+	'''bounded LRU cache of HuffmanTables keyed by the code lengths (and rootBits): blocks that repeat
+	   the code lengths of a recent block reuse its table instead of building it again.
+	   Shared by threads (GZIP.tableCache, decoders in worker threads): the LRU order is kept under a lock'''
+
+	def __init__(self, maxSize=64):
+		self.maxSize = maxSize
+		self.tables = OrderedDict()
+		self.hits = self.misses = 0
+		self.lock = threading.Lock()
+
+
+	def get(self, lenArray, rootBits=9):
+		''' returns the HuffmanTable of the code lengths, building it on a miss '''
+		key = (rootBits, bytes(lenArray))
+		with self.lock:
+			table = self.tables.get(key)
+			if table is not None:
+				self.hits += 1
+				self.tables.move_to_end(key)
+				return table
+			self.misses += 1
+
+		table = HuffmanTable(lenArray, rootBits)  # built outside the lock: other threads go on meanwhile
+		with self.lock:
+			self.tables[key] = table
+			if len(self.tables) > self.maxSize:
+				self.tables.popitem(last=False)
+		return table
+
+
+	def clear(self):
+		with self.lock:
+			self.tables.clear()
+			self.hits = self.misses = 0
+
+
+def canonicalCodes(lenArray):
+	''' returns the canonical Huffman codes (RFC 1951, 3.2.2) of the code lengths, as ints
+		(first bit = most significant). Raises CodeSetError if the set of lengths is over-subscribed,
+		or incomplete (only a single code of length 1 may leave codes unused, as in zlib) '''
+
+	maxLen = max(lenArray) if lenArray else 0
+	bl_count = [0] * (maxLen + 1)
+	for length in lenArray:
+		bl_count[length] += 1
+	bl_count[0] = 0
+
+	# Kraft inequality: left = codes of the current length still free
+	left = 1
+	for bits in range(1, maxLen + 1):
+		left = (left << 1) - bl_count[bits]
+		if left < 0:
+			raise CodeSetError("Over-subscribed set of Huffman code lengths")
+	if left > 0 and maxLen > 1:
+		raise CodeSetError("Incomplete set of Huffman code lengths")
+
+	code = 0
+	next_code = [0] * (maxLen + 1)
+	for bits in range(1, maxLen + 1):
+		code = (code + bl_count[bits-1]) << 1
+		next_code[bits] = code
+
+	codes = [0] * len(lenArray)
+	for symbol, length in enumerate(lenArray):
+		if length != 0:
+			codes[symbol] = next_code[length]
+			next_code[length] += 1
+	return codes
+
+
+def reverseBits(code, length):
+	''' reverses the first length bits of code (Huffman codes are stored MSB first in a LSB first stream) '''
+	rev = 0
+	for i in range(length):
+		rev = (rev << 1) | (code & 1)
+		code >>= 1
+	return rev
@@ -0,0 +1,98 @@
+# Teoria da Informacao, LEI, 2022
+# Inflate backends: decoders for the deflate blocks of a GZIP member
+
+from errors import BlockError, CodeSetError, DistanceTooFarError, TruncatedError
+from window import WSIZE
+
+try:  # C inflater from the standard library, when the interpreter provides it
+    import zlib as _zlib
+except ImportError:
+    _zlib = None
+
+try:  # optional: ISA-L inflater (python-isal), faster than zlib
+    from isal import isal_zlib as _isal
+except ImportError:
+    _isal = None
+
+
+class PythonBackend:
+    ''' reference implementation: the pure-Python, table-driven block decoder of GZIP
+        (GZIP.inflateBlocks). Reports every block: the only backend that can print the
+        block details (verbose), record index checkpoints or resume at a bit offset. '''
+
+    name = 'python'
+    blockLevel = True
+
+    def inflate(self, gz, out, history=b''):
+        ''' generator: decodes the deflate blocks at gz.reader into out (SlidingWindow),
+            yielding after each block. history (e.g. a preset dictionary) must already be in out '''
+        return gz.inflateBlocks(out)
+
+
+class ZlibBackend:
+    ''' compiled inflater of a zlib compatible module, fed with the bytes buffered by the
+        BitReader: literals, matches and table lookups all run in C. It decodes the deflate
+        stream as a whole, so blocks are not reported (GZIP.numBlocks stays 0). '''
+
+    blockLevel = False
+    OUT_CHUNK = 1 << 18  # most bytes decoded per call, so that output stays bounded
+
+    def __init__(self, name, module):
+        self.name = name
+        self.module = module
+
+    def inflate(self, gz, out, history=b''):
+        ''' generator: decodes the deflate stream at gz.reader into out (SlidingWindow),
+            yielding after each piece of output; the input after the stream is given back to the reader.
+            history: data decoded before the stream (e.g. a preset dictionary), for its first matches '''
+        reader = gz.reader
+        # raw deflate: header and trailer are read by GZIP
+        d = self.module.decompressobj(-15, zdict=history[-WSIZE:]) if history else self.module.decompressobj(-15)
+        data = b''
+        while not d.eof:
+            if not data:
+                data = reader.readChunk()
+            try:
+                chunk = d.decompress(data, self.OUT_CHUNK)
+            except self.module.error as e:
+                raise self.error(e)
+            # no input left: only truncated if the inflater had no output held back either
+            if not data and not chunk and not d.eof:
+                raise TruncatedError()
+            out.write(chunk)
+            data = d.unconsumed_tail
+            yield
+        reader.unread(len(d.unused_data))
+
+    @staticmethod
+    def error(e):
+        ''' the GZIPError matching an error of the compiled inflater (told apart by its message) '''
+        message = str(e)
+        if 'too far' in message:
+            cls = DistanceTooFarError
+        elif 'code' in message or ' set' in message or 'repeat' in message or 'symbols' in message:
+            cls = CodeSetError
+        else:
+            cls = BlockError
+        return cls('Error: invalid deflate data (%s)' % message)
+
+
+PYTHON_BACKEND = PythonBackend()
+
+# available backends, fastest first
+BACKENDS = {}
+if _isal is not None:
+    BACKENDS['isal'] = ZlibBackend('isal', _isal)
+if _zlib is not None:
+    BACKENDS['zlib'] = ZlibBackend('zlib', _zlib)
+BACKENDS['python'] = PYTHON_BACKEND
+
+
+def getBackend(name=None):
+    ''' returns the backend called name ('python', 'zlib', 'isal'), or the fastest one
+        available if name is None. Raises ValueError if it is not available '''
+    if name is None:
+        return next(iter(BACKENDS.values()))
+    if name not in BACKENDS:
+        raise ValueError('Inflate backend not available: %s (available: %s)' % (name, ', '.join(BACKENDS)))
+    return BACKENDS[name]
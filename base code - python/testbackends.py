@@ -0,0 +1,71 @@
+import glob
+import os
+import zlib
+from gzip import GZIP
+from inflate import BACKENDS
+from zlibstream import Inflater, inflateRaw
+
+
+# every backend must produce the same output as the pure-Python reference
+
+samples = ['FAQ.txt.gz'] + sorted(glob.glob(os.path.join('..', 'Test Samples', '*.gz')))
+
+for fileName in samples:
+	outputs = {}
+	for name in BACKENDS:
+		gz = GZIP(fileName, verbose=False, backend=name)
+		outputs[name] = b''.join(gz.decompressChunks())
+		gz.close()
+
+	reference = outputs['python']
+	for name, data in outputs.items():
+		print(os.path.basename(fileName), name, len(data), 'OK' if data == reference else 'DIFFERENT')
+
+# raw DEFLATE and zlib messages, with and without a preset dictionary
+
+with open('FAQ.txt', 'rb') as f:
+	text = f.read()
+zdict = text[:1024]
+messages = [text[i:i + 300] for i in range(0, len(text), 300)]
+
+for fmt, wbits in (('raw', -15), ('zlib', 15)):
+	for d in (b'', zdict):
+		for name in BACKENDS:
+			inflater = Inflater(fmt, d, backend=name)
+			ok = True
+			for m in messages:
+				c = zlib.compressobj(9, zlib.DEFLATED, wbits, zdict=d) if d else zlib.compressobj(9, zlib.DEFLATED, wbits)
+				ok = ok and inflater.decompress(c.compress(m) + c.flush()) == m
+			print(fmt, 'dictionary' if d else 'no dictionary', name, inflater.messages, 'OK' if ok else 'DIFFERENT')
+
+
+# raw stream whose last input ends exactly where a compiled backend stops for its output limit:
+# output is still held back in the inflater when the input runs out
+
+for k in (0, 1, 4, 1000):
+	data = bytes(range(256)) * (k // 256) + b'a' * (262167 + k % 256)
+	c = zlib.compressobj(9, zlib.DEFLATED, -15)
+	raw = c.compress(data) + c.flush()
+	for name in BACKENDS:
+		print('raw', len(data), name, 'OK' if inflateRaw(raw, backend=name) == data else 'DIFFERENT')
+
+
+# in-memory output sized from ISIZE: stored blocks (incompressible data) of every size zlib writes,
+# and an ISIZE that wrapped around (a 5 GiB member is simulated: ISIZE 1 GiB, 5 GiB of deflate data)
+
+rnd = os.urandom(1 << 20)
+for level in (0, 9):
+	c = zlib.compressobj(level, zlib.DEFLATED, 31)
+	gzData = c.compress(rnd) + c.flush()
+	for name in BACKENDS:
+		gz = GZIP(gzData, backend=name)
+		size = gz.expectedSize()
+		print('stored level', level, name, size, 'OK' if size == len(rnd) and gz.decompressInto() == rnd else 'DIFFERENT')
+
+gz = GZIP('FAQ.txt.gz')
+gz.fileSize = (5 << 30) + gz.getHeaderSize() + 8
+gz.getOrigFileSize = lambda: 1 << 30
+print('wraparound', gz.expectedSize(), 'OK' if gz.expectedSize() == 5 << 30 else 'DIFFERENT')
+gz.getOrigFileSize = lambda: 3 << 30  # not below half of the deflate data: taken as it is
+print('no wraparound', gz.expectedSize(), 'OK' if gz.expectedSize() == 3 << 30 else 'DIFFERENT')
+gz.close()
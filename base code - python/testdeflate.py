@@ -0,0 +1,34 @@
+import random
+import zlib
+from deflate import Deflater, compressGzip, levelReport
+from gzip import GZIP
+
+
+# every level must round trip through the pure-Python decoder and through zlib
+
+with open('FAQ.txt', 'rb') as f:
+	text = f.read()
+rnd = random.Random(2022)
+
+inputs = [
+	('empty', b''),
+	('one byte', b'a'),
+	('FAQ.txt', text),
+	('long run', b'a' * 70000),  # matches of 258 bytes, one after the other
+	('random', rnd.randbytes(100000)),  # incompressible: stored blocks at every level
+	('mixed', rnd.randbytes(3000) + b'xyz' * 3000 + text * 20),
+	('few symbols', bytes(rnd.choice(b'abcd') for i in range(3000))),  # short code length arrays
+]
+
+for name, data in inputs:
+	for level in range(10):
+		gz = compressGzip(data, level, 'x.bin')
+		python = b''.join(GZIP(gz, backend='python').decompressChunks()) == data
+		viaZlib = zlib.decompress(gz, 31) == data and zlib.decompress(Deflater(level).compress(data), -15) == data
+		print(name, 'level', level, len(gz), 'OK' if python and viaZlib else 'DIFFERENT')
+
+
+# size and speed of every level, each checked by the pure-Python decoder
+
+for level, compressedSize, ratio, speed in levelReport(text):
+	print('levelReport', level, compressedSize, '%.3f' % ratio)
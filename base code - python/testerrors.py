@@ -0,0 +1,43 @@
+import zlib
+from gzip import GZIP
+from errors import GZIPError
+from inflate import BACKENDS
+
+
+# every kind of damaged input raises its GZIPError, with every backend
+
+with open('FAQ.txt.gz', 'rb') as f:
+	data = f.read()
+
+def gzipped(deflated):
+	return data[:18] + deflated + data[-8:]
+
+flipped = bytearray(data)
+flipped[-8] ^= 1  # CRC32
+
+cases = [
+	('truncated', data[:600]),
+	('not gzip', b'PK\x03\x04' + data[4:]),
+	('short, not gzip', b'PK\x03\x04'),  # HeaderError, not truncated: the magic is checked first
+	('checksum', bytes(flipped)),
+	('reserved block type', gzipped(b'\x07')),  # BFINAL=1, BTYPE=3
+	('stored LEN/NLEN', gzipped(b'\x01\x05\x00\x00\x00')),
+	('too many symbols', gzipped(b'\xfd\xff')),  # BTYPE=2, HLIT=31
+	('distance too far', gzipped(b'\x03\x02\x04\x00')),  # fixed codes: a match before any data
+	('fixed code 286', gzipped(b'\x1b\x03\x00')),  # fixed literal/length code 286 never occurs
+]
+
+for name, gz in cases:
+	for backend in BACKENDS:
+		try:
+			GZIP(gz, verbose=False, backend=backend).decompressInto()
+			print(name, backend, 'no error')
+		except GZIPError as e:
+			print(name, backend, type(e).__name__, e)
+
+
+# salvage: the data before the damage, and where it is
+
+text = zlib.decompress(data, 31)
+out, diagnostic = GZIP(data[:700], verbose=False).salvage()
+print(len(out), text.startswith(bytes(out)), diagnostic)
@@ -1,4 +1,4 @@
-from huffmantree import HuffmanTree
+from huffmantree import ArrayHuffmanTree, HuffmanTree, HuffmanTable, canonicalCodes
 
 
 hft = HuffmanTree()
@@ -82,3 +82,66 @@ pos = search_bit_by_bit(code, True)
 
 code = "1110"
 pos = search_bit_by_bit(code, True)
+
+
+
+# ------------------- Integer codes
+
+hfi = HuffmanTree()
+
+# "000" and "11100" as ints, same results as addNode / findNode
+print(hfi.addCode(0b000, 3, 0))
+print(hfi.addCode(0b000, 3, 1))  # -1: already inserted
+print(hfi.addCode(0b00001, 5, 1))  # -2: not prefix code
+print(hfi.addCode(0b11100, 5, 3))
+
+print(hfi.findCode(0b11100, 5))  # 3
+print(hfi.findCode(0b111, 3))  # -2: prefix
+print(hfi.findCode(0b01, 2))  # -1: not found
+
+
+# ------------------- Array tree
+
+# ArrayHuffmanTree: the same sequence, the same results as HuffmanTree
+hft = ArrayHuffmanTree()
+
+for code, ind in (("000", 0), ("000", 1), ("00001", 1), ("11100", 3), ("11100", 3), ("111001", 3)):
+	erro = hft.addNode(code, ind, verbose)
+
+for code in ("000", "11100", "111"):
+	pos = hft.findNode(code, None, verbose)
+
+for code in ("111000100", "1110"):
+	pos = search_bit_by_bit(code, True)
+
+hfa = ArrayHuffmanTree()
+print(hfa.addCode(0b000, 3, 0))
+print(hfa.addCode(0b000, 3, 1))  # -1: already inserted
+print(hfa.addCode(0b00001, 5, 1))  # -2: not prefix code
+print(hfa.addCode(0b11100, 5, 3))
+
+print(hfa.findCode(0b11100, 5))  # 3
+print(hfa.findCode(0b111, 3))  # -2: prefix
+print(hfa.findCode(0b01, 2))  # -1: not found
+
+
+# ------------------- Canonical codes from code lengths
+
+print(canonicalCodes([2, 1, 3, 3]))  # [2, 0, 6, 7]: '10', '0', '110', '111'
+
+for lens in ([1, 1, 1], [2, 2, 2]):  # over-subscribed / incomplete
+	try:
+		canonicalCodes(lens)
+	except ValueError as e:
+		print(lens, e)
+
+
+# ------------------- Two literals per lookup
+
+# 'a' = 0, 'b' = 10, 'c' = 110, end of block = 111: 3 root bits hold 'aa', 'ab' or 'ba'
+lens = [0] * 257
+lens[ord('a')], lens[ord('b')], lens[ord('c')], lens[256] = 1, 2, 3, 3
+ht = HuffmanTable(lens, 3)
+for i, entry in enumerate(ht.literalPairs()):  # index bits are read LSB first
+	if entry:
+		print(format(i, '03b'), chr(entry & 0xFF), chr((entry >> 8) & 0xFF), entry >> 16)
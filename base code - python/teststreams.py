@@ -0,0 +1,114 @@
+import asyncio
+import glob
+import io
+import os
+import random
+import tempfile
+import zlib
+from gzip import GZIP, GZIPReader
+from gzindex import GZIPIndex
+from gzstream import GZIPDecompressor, decompressStream
+from inflate import BACKENDS, ZlibBackend
+
+
+def gunzip(data):
+	''' reference output of zlib, every member '''
+	out = []
+	while data:
+		d = zlib.decompressobj(31)
+		out.append(d.decompress(data))
+		data = d.unused_data
+	return b''.join(out)
+
+def pieces(data, maxSize, rnd):
+	''' data cut in pieces of 1 to maxSize bytes '''
+	i = 0
+	while i < len(data):
+		n = rnd.randint(1, maxSize)
+		yield data[i:i + n]
+		i += n
+
+
+class Stream:
+	''' stands for an asyncio StreamReader: read returns pieces of random size '''
+
+	def __init__(self, data, maxSize, rnd):
+		self.pieces = pieces(data, maxSize, rnd)
+
+	async def read(self, n):
+		return next(self.pieces, b'')
+
+async def readStream(data, maxSize, rnd, backend, inThread):
+	return b''.join([chunk async for chunk in decompressStream(Stream(data, maxSize, rnd), backend=backend, inThread=inThread)])
+
+
+rnd = random.Random(2022)
+tmpDir = tempfile.mkdtemp()
+
+# multi-member file: three gzip members, one of them empty
+with open('FAQ.txt', 'rb') as f:
+	text = f.read()
+multi = os.path.join(tmpDir, 'multi.txt.gz')
+with open(multi, 'wb') as f:
+	for member in (text, b'', text[::-1] * 20):
+		c = zlib.compressobj(6, zlib.DEFLATED, 31)
+		f.write(c.compress(member) + c.flush())
+
+samples = ['FAQ.txt.gz', multi] + sorted(glob.glob(os.path.join('..', 'Test Samples', '*.gz')))
+
+for fileName in samples:
+	with open(fileName, 'rb') as f:
+		data = f.read()
+	reference = gunzip(data)
+	name = os.path.basename(fileName)
+
+	# push decoder: pieces of 1..N bytes, with every backend
+	for maxSize in (7, 4096):
+		for backend in BACKENDS:
+			d = GZIPDecompressor(backend=backend)
+			out = b''.join(d.feed(piece) for piece in pieces(data, maxSize, rnd)) + d.flush()
+			print(name, 'feed 1..%d' % maxSize, backend, len(d.members), 'OK' if out == reference else 'DIFFERENT')
+
+	# asyncio adapter, in the event loop and in a worker thread
+	for inThread in (False, True):
+		for backend in BACKENDS:
+			out = asyncio.run(readStream(data, 4096, rnd, backend, inThread))
+			print(name, 'stream', 'thread' if inThread else 'loop', backend, 'OK' if out == reference else 'DIFFERENT')
+
+	# random access: index saved and loaded again, pread and GZIPReader.seek at random offsets
+	gz = GZIP(fileName)
+	index = gz.buildIndex(1 << 16)
+	gz.close()
+	indexName = os.path.join(tmpDir, name + '.idx')
+	index.save(indexName)
+	loaded = GZIPIndex.load(indexName)
+	same = [(c.out, c.bit, c.window) for c in loaded.checkpoints] == [(c.out, c.bit, c.window) for c in index.checkpoints]
+	print(name, 'index', len(loaded.checkpoints), loaded.size, 'OK' if same and loaded.size == len(reference) else 'DIFFERENT')
+
+	gz = GZIP(fileName)
+	reader = io.BufferedReader(GZIPReader(fileName, index=loaded))  # the raw reader may return less than asked
+	preadOk = seekOk = True
+	for i in range(20):
+		offset = rnd.randrange(len(reference) + 1)
+		length = rnd.randint(0, 70000)
+		preadOk = preadOk and gz.pread(offset, length, loaded) == reference[offset:offset + length]
+		reader.seek(offset)
+		seekOk = seekOk and reader.read(length) == reference[offset:offset + length]
+	reader.close()
+	gz.close()
+	print(name, 'pread', 'OK' if preadOk else 'DIFFERENT')
+	print(name, 'seek', 'OK' if seekOk else 'DIFFERENT')
+
+# highly compressed input (16 MiB of zeros in 16 KiB): the output comes in bounded pieces
+c = zlib.compressobj(9, zlib.DEFLATED, 31)
+bomb = c.compress(bytes(16 << 20)) + c.flush()
+for backend in BACKENDS:
+	if backend == 'python':
+		continue  # a block at a time: bounded by the block, not by OUT_CHUNK
+	d = GZIPDecompressor(backend=backend)
+	sizes = [len(piece) for piece in d.feedChunks(bomb)] + [len(d.flush())]
+	print('bomb', backend, sum(sizes), max(sizes), 'OK' if sum(sizes) == 16 << 20 and max(sizes) <= ZlibBackend.OUT_CHUNK else 'DIFFERENT')
+
+for fileName in os.listdir(tmpDir):
+	os.unlink(os.path.join(tmpDir, fileName))
+os.rmdir(tmpDir)
@@ -0,0 +1,157 @@
+# Teoria da Informacao, LEI, 2022
+# LZ77 sliding window for the DEFLATE decoder
+
+from checksum import adler32, crc32
+from errors import DistanceTooFarError
+
+WSIZE = 32768  # history needed by DEFLATE distances
+MAX_MATCH = 258  # longest LZ77 match
+
+
+class SlidingWindow:
+    ''' fixed capacity bytearray with the LZ77 output: the last WSIZE bytes of history
+        plus a flush region. Decoded bytes are written at pos; when pos passes limit the
+        new bytes are handed to sink in one chunk and the history is moved to the front. '''
+
+    def __init__(self, sink=None, flushSize=1 << 18, views=False):
+        self.sink = sink  # callable receiving each chunk of output (e.g. file.write); None discards it
+        self.views = views  # True: sink gets a memoryview of the window (valid during the call only), not a copy
+        self.crc = None  # CRC32 of the bytes flushed, when set to 0 (None: not computed)
+        self.adler = None  # Adler-32 of the bytes flushed, when set to 1 (zlib streams)
+        self.capacity = WSIZE + flushSize
+        self.limit = self.capacity - MAX_MATCH  # room for one more match after this position
+        self.buf = bytearray(self.capacity)
+        self.pos = 0  # next position to write
+        self.start = 0  # first byte not yet handed to sink
+        self.total = 0  # bytes handed to sink so far
+        self.origin = 0  # position of the first byte matches may reach (negative once slid out)
+
+    def preset(self, history):
+        ''' loads history (e.g. the window of a checkpoint, or a preset dictionary) as already
+            decoded data: available to matches but never handed to sink '''
+        history = history[-WSIZE:]
+        self.buf[0:len(history)] = history
+        self.pos = self.start = len(history)
+        self.origin = 0
+
+    def reset(self, history=b''):
+        ''' empties the window for a new stream, keeping its buffer; see preset for history '''
+        self.total = 0
+        self.preset(history)
+
+    def history(self):
+        ''' returns the last WSIZE bytes written '''
+        return bytes(self.buf[max(0, self.pos - WSIZE):self.pos])
+
+    def flush(self):
+        ''' hands the bytes written since the last flush to sink (and adds them to crc and adler) '''
+        if self.pos > self.start:
+            with memoryview(self.buf) as view:
+                data = view[self.start:self.pos]
+                if self.crc is not None:
+                    self.crc = crc32(data, self.crc)
+                if self.adler is not None:
+                    self.adler = adler32(data, self.adler)
+                if self.sink is not None:
+                    self.sink(data if self.views else bytes(data))
+                data.release()
+            self.total += self.pos - self.start
+            self.start = self.pos
+
+    def slide(self):
+        ''' flushes and keeps only the last WSIZE bytes, moved to the front of the buffer.
+            Returns True (see BufferWindow) '''
+        self.flush()
+        keep = min(self.pos, WSIZE)
+        self.buf[0:keep] = self.buf[self.pos - keep:self.pos]
+        self.origin -= self.pos - keep
+        self.pos = self.start = keep
+        return True
+
+    def write(self, data):
+        ''' appends a run of bytes (e.g. a stored block) '''
+        data = memoryview(data)
+        i = 0
+        while i < len(data):
+            if self.pos > self.limit:
+                self.slide()
+            n = min(len(data) - i, self.capacity - self.pos)
+            self.buf[self.pos:self.pos + n] = data[i:i + n]
+            self.pos += n
+            i += n
+
+    def copyMatch(self, distance, length):
+        ''' appends length bytes copied from distance bytes back '''
+        if self.pos > self.limit:
+            self.slide()
+        self._copy(distance, length)
+
+    def _copy(self, distance, length):
+        ''' copies a match at pos (no room checks) '''
+        buf = self.buf
+        pos = self.pos
+        start = pos - distance
+        if start < self.origin:
+            raise DistanceTooFarError('Invalid distance too far back (%d)' % distance)
+        if length <= distance:  # no overlap: one slice
+            buf[pos:pos + length] = buf[start:start + length]
+            pos += length
+        else:  # overlapping run: copy the pattern, doubling it each time
+            end = pos + length
+            while pos < end:
+                n = min(pos - start, end - pos)
+                buf[pos:pos + n] = buf[start:start + n]
+                pos += n
+        self.pos = pos
+
+
+class BufferWindow(SlidingWindow):
+    ''' LZ77 output written straight into one buffer that holds all of it: nothing is moved
+        nor copied out. buffer is a bytearray or any writable buffer (memoryview, mmap, array...).
+        With grow=True a bytearray too small is extended in place, by half its size at least;
+        otherwise writing past its end raises ValueError '''
+
+    GROW_MIN = 1 << 16  # fewest bytes added when a buffer grows
+
+    def __init__(self, buffer, grow=False):
+        self.sink = None
+        self.views = True
+        self.crc = self.adler = None
+        self.buf = buffer if isinstance(buffer, bytearray) else memoryview(buffer).cast('B')
+        self.grow = grow and isinstance(buffer, bytearray)
+        self.capacity = len(self.buf)
+        self.limit = self.capacity - MAX_MATCH
+        self.pos = self.start = self.total = self.origin = 0
+
+    def slide(self):
+        ''' only flushes: the buffer keeps everything. Returns False: the decoder must go on
+            with the checked writes (write, copyMatch) '''
+        self.flush()
+        return False
+
+    def reserve(self, n):
+        ''' makes sure that n more bytes fit after pos '''
+        if self.pos + n <= self.capacity:
+            return
+        if not self.grow:
+            raise ValueError('Error: output buffer too small (%d bytes)' % self.capacity)
+        # resized in place: realloc can often extend it without a second copy of the data
+        self.buf += bytes(max(self.pos + n - self.capacity, self.capacity >> 1, self.GROW_MIN))
+        self.capacity = len(self.buf)
+        self.limit = self.capacity - MAX_MATCH
+
+    def write(self, data):
+        self.reserve(len(data))
+        self.buf[self.pos:self.pos + len(data)] = data
+        self.pos += len(data)
+
+    def copyMatch(self, distance, length):
+        self.reserve(length)
+        self._copy(distance, length)
+
+    def data(self):
+        ''' the bytes written: the buffer itself if they fill it (a grown buffer is trimmed),
+            a memoryview of them otherwise '''
+        if self.grow:
+            del self.buf[self.pos:]
+        return self.buf if len(self.buf) == self.pos else memoryview(self.buf)[:self.pos]
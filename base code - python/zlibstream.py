@@ -0,0 +1,92 @@
+# Teoria da Informacao, LEI, 2022
+# Raw DEFLATE (RFC 1951) and zlib (RFC 1950) messages, with preset dictionaries
+
+import struct
+
+from bitreader import BitReader
+from checksum import adler32
+from errors import ChecksumError, HeaderError
+from gzip import GZIP
+from window import SlidingWindow
+
+FORMATS = ['raw', 'zlib']
+ADLER = struct.Struct('>I')  # DICTID and the trailer of a zlib stream (MSB first)
+
+
+class Inflater:
+    ''' reusable decompressor of whole messages in raw DEFLATE or zlib format (e.g. small RPC
+        payloads compressed with a shared preset dictionary). The block decoder, its window and
+        the decode tables (the fixed ones and GZIP.tableCache) are kept between messages, so a
+        message costs little more than its own decoding.
+        zdict: preset dictionary, the data the compressor's window started with.
+        verify=False skips the Adler-32 check of zlib messages.
+        backend: as in GZIP ('python', 'zlib', 'isal'; None for the fastest) '''
+
+    def __init__(self, format='zlib', zdict=b'', verify=True, backend=None):
+        if format not in FORMATS:
+            raise ValueError('Unknown format: %s (formats: %s)' % (format, ', '.join(FORMATS)))
+        self.format = format
+        self.zdict = bytes(zdict)
+        self.dictId = adler32(self.zdict)  # DICTID of zdict in a zlib header
+        self.verify = verify
+        self.gz = GZIP(b'', verbose=False, verify=verify, backend=backend)
+        self.chunks = []
+        self.out = SlidingWindow(self.chunks.append)
+        self.unusedData = b''  # input left after the last message
+        self.messages = 0  # messages decompressed so far
+
+    def decompress(self, data):
+        ''' decompresses one whole message and returns its data; input after the end of the
+            message is kept in unusedData. Raises GZIPError (errors.py) on invalid data or a
+            missing or wrong preset dictionary, TruncatedError if the message is truncated '''
+        gz = self.gz
+        reader = gz.reader = BitReader(data)
+        out = self.out
+        zdict = self.zdict if self.format == 'raw' else self._readHeader(reader)
+        out.reset(zdict)
+        out.adler = 1 if self.format == 'zlib' and self.verify else None
+
+        try:
+            for _ in gz.backend.inflate(gz, out, zdict):
+                pass
+            out.flush()
+
+            if self.format == 'zlib':
+                adler, = ADLER.unpack(reader.readBytes(4))
+                if out.adler is not None and out.adler != adler:
+                    raise ChecksumError('Error: Adler-32 mismatch (expected %08x, got %08x)' % (adler, out.adler))
+            data = b''.join(self.chunks)
+        finally:
+            self.chunks.clear()
+
+        reader.alignToByte()
+        self.unusedData = bytes(reader.buf[reader.pos:])
+        self.messages += 1
+        return data
+
+    def _readHeader(self, reader):
+        ''' reads the header of a zlib stream (CMF, FLG and DICTID). Returns the preset
+            dictionary the stream needs (b'' if none) '''
+        cmf, flg = reader.readBytes(2)
+        # CM = 8 (deflate), CINFO: window of at most 32 KiB, FCHECK: CMF * 256 + FLG multiple of 31
+        if cmf & 0x0F != 8 or cmf >> 4 > 7 or ((cmf << 8) | flg) % 31 != 0:
+            raise HeaderError('Error: invalid zlib header')
+        if not flg & 0x20:  # FDICT
+            return b''
+
+        dictId, = ADLER.unpack(reader.readBytes(4))
+        if not self.zdict:
+            raise HeaderError('Error: preset dictionary required (DICTID %08x)' % dictId)
+        if dictId != self.dictId:
+            raise HeaderError('Error: wrong preset dictionary (DICTID %08x, expected %08x)' % (dictId, self.dictId))
+        return self.zdict
+
+
+def inflateRaw(data, zdict=b'', backend=None):
+    ''' decompresses a raw DEFLATE stream (no header nor trailer) '''
+    return Inflater('raw', zdict, backend=backend).decompress(data)
+
+
+def inflateZlib(data, zdict=b'', verify=True, backend=None):
+    ''' decompresses a zlib stream, checking its Adler-32 unless verify is False '''
+    return Inflater('zlib', zdict, verify, backend).decompress(data)